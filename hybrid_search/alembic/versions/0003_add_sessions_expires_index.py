@@ -0,0 +1,22 @@
+"""
+Index user_sessions.expires_at for batched expiry cleanup
+
+Revision ID: 0003_add_sessions_expires_index
+Revises: 0002_add_chat_tables
+Create Date: 2026-10-15 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003_add_sessions_expires_index'
+down_revision = '0002_add_chat_tables'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('idx_sessions_expires_at', 'user_sessions', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('idx_sessions_expires_at', table_name='user_sessions')
@@ -0,0 +1,35 @@
+"""
+Covering index on user_sessions.session_token
+
+Revision ID: 0004_add_sessions_token_covering_index
+Revises: 0003_add_sessions_expires_index
+Create Date: 2026-10-15 00:00:10.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004_add_sessions_token_covering_index'
+down_revision = '0003_add_sessions_expires_index'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_sessions_token_covering',
+            'user_sessions',
+            ['session_token'],
+            postgresql_include=['user_id', 'expires_at'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_sessions_token_covering',
+            table_name='user_sessions',
+            postgresql_concurrently=True,
+        )
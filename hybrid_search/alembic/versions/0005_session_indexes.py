@@ -0,0 +1,26 @@
+"""
+Replace idx_sessions_user_id with a (user_id, expires_at) composite index
+
+Revision ID: 0005_session_indexes
+Revises: 0004_add_sessions_token_covering_index
+Create Date: 2026-10-15 00:00:20.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005_session_indexes'
+down_revision = '0004_add_sessions_token_covering_index'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # The composite index also serves user_id-only lookups (FK cascades),
+    # so the single-column index is redundant write overhead on every login
+    op.create_index('idx_sessions_user_expires', 'user_sessions', ['user_id', 'expires_at'])
+    op.drop_index('idx_sessions_user_id', table_name='user_sessions')
+
+
+def downgrade():
+    op.create_index('idx_sessions_user_id', 'user_sessions', ['user_id'])
+    op.drop_index('idx_sessions_user_expires', table_name='user_sessions')
@@ -0,0 +1,50 @@
+"""
+Bump chat_sessions.updated_at from a trigger on chat_messages inserts
+
+Revision ID: 0006_touch_chat_session_trigger
+Revises: 0005_session_indexes
+Create Date: 2026-10-15 00:00:30.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006_touch_chat_session_trigger'
+down_revision = '0005_session_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # Statement-level with a transition table: a batched insert (or COPY)
+    # touches each affected session once instead of once per message
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION touch_chat_session() RETURNS trigger AS $$
+        BEGIN
+            UPDATE chat_sessions
+               SET updated_at = now()
+             WHERE id IN (SELECT DISTINCT chat_session_id FROM new_messages);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER chat_session_touch
+        AFTER INSERT ON chat_messages
+        REFERENCING NEW TABLE AS new_messages
+        FOR EACH STATEMENT EXECUTE FUNCTION touch_chat_session();
+        """
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS chat_session_touch ON chat_messages")
+    op.execute("DROP FUNCTION IF EXISTS touch_chat_session()")
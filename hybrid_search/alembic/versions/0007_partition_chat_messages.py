@@ -0,0 +1,93 @@
+"""
+Hash-partition chat_messages by chat_session_id
+
+Revision ID: 0007_partition_chat_messages
+Revises: 0006_touch_chat_session_trigger
+Create Date: 2026-10-15 00:00:40.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0007_partition_chat_messages'
+down_revision = '0006_touch_chat_session_trigger'
+branch_labels = None
+depends_on = None
+
+NUM_PARTITIONS = 16
+
+COLUMNS = "id, chat_session_id, user_id, role, content, message_metadata, created_at"
+
+
+def _create_touch_trigger():
+    op.execute(
+        """
+        CREATE TRIGGER chat_session_touch
+        AFTER INSERT ON chat_messages
+        REFERENCING NEW TABLE AS new_messages
+        FOR EACH STATEMENT EXECUTE FUNCTION touch_chat_session();
+        """
+    )
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("ALTER TABLE chat_messages RENAME TO chat_messages_old")
+
+    # The partition key must be part of the primary key; (chat_session_id, id)
+    # is also exactly the index list_messages needs, so each partition gets it
+    op.execute(
+        """
+        CREATE TABLE chat_messages (
+            id INTEGER NOT NULL DEFAULT nextval('chat_messages_id_seq'),
+            chat_session_id INTEGER NOT NULL REFERENCES chat_sessions(id) ON DELETE CASCADE,
+            user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+            role VARCHAR(20) NOT NULL,
+            content TEXT NOT NULL,
+            message_metadata JSON,
+            created_at TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (chat_session_id, id)
+        ) PARTITION BY HASH (chat_session_id)
+        """
+    )
+    for remainder in range(NUM_PARTITIONS):
+        op.execute(
+            f"CREATE TABLE chat_messages_p{remainder} PARTITION OF chat_messages "
+            f"FOR VALUES WITH (MODULUS {NUM_PARTITIONS}, REMAINDER {remainder})"
+        )
+
+    op.execute(f"INSERT INTO chat_messages ({COLUMNS}) SELECT {COLUMNS} FROM chat_messages_old")
+    op.execute("ALTER SEQUENCE chat_messages_id_seq OWNED BY chat_messages.id")
+    op.execute("DROP TABLE chat_messages_old")
+
+    op.create_index('idx_chat_messages_user_id', 'chat_messages', ['user_id'])
+    _create_touch_trigger()
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("ALTER TABLE chat_messages RENAME TO chat_messages_partitioned")
+    op.execute(
+        """
+        CREATE TABLE chat_messages (
+            id INTEGER NOT NULL DEFAULT nextval('chat_messages_id_seq') PRIMARY KEY,
+            chat_session_id INTEGER NOT NULL REFERENCES chat_sessions(id) ON DELETE CASCADE,
+            user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+            role VARCHAR(20) NOT NULL,
+            content TEXT NOT NULL,
+            message_metadata JSON,
+            created_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+        """
+    )
+    op.execute(f"INSERT INTO chat_messages ({COLUMNS}) SELECT {COLUMNS} FROM chat_messages_partitioned")
+    op.execute("ALTER SEQUENCE chat_messages_id_seq OWNED BY chat_messages.id")
+    op.execute("DROP TABLE chat_messages_partitioned")
+
+    op.create_index('idx_chat_messages_session_id', 'chat_messages', ['chat_session_id'])
+    op.create_index('idx_chat_messages_user_id', 'chat_messages', ['user_id'])
+    _create_touch_trigger()
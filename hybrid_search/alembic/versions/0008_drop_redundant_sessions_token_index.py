@@ -0,0 +1,32 @@
+"""
+Drop idx_sessions_token; the UNIQUE constraint and covering index already serve token lookups
+
+Revision ID: 0008_drop_redundant_sessions_token_index
+Revises: 0007_partition_chat_messages
+Create Date: 2026-10-15 00:00:50.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008_drop_redundant_sessions_token_index'
+down_revision = '0007_partition_chat_messages'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # session_token is UNIQUE (its own index) and idx_sessions_token_covering
+    # answers logout/lookup by token; a third B-tree only slows every login.
+    # IF EXISTS: databases created from init.sql may not have it.
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_sessions_token")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_sessions_token',
+            'user_sessions',
+            ['session_token'],
+            postgresql_concurrently=True,
+        )
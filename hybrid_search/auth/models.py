@@ -1,10 +1,15 @@
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
 
+def utc_now() -> datetime:
+    """Current UTC time as a naive datetime, matching the naive DateTime columns"""
+    return datetime.fromtimestamp(time.time(), timezone.utc).replace(tzinfo=None)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -14,17 +19,22 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=utc_now)
+    updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
 
 class UserSession(Base):
     __tablename__ = "user_sessions"
+    # Names match the Alembic migrations, so the create_all fallback builds the same indexes
+    __table_args__ = (
+        Index("idx_sessions_user_expires", "user_id", "expires_at"),
+        Index("idx_sessions_expires_at", "expires_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     session_token = Column(String(255), unique=True, index=True, nullable=False)
     expires_at = Column(DateTime, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=utc_now)
 
 # Pydantic models
 class UserCreate(BaseModel):
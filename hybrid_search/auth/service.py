@@ -1,25 +1,90 @@
-import json
+import os
+import hmac
+import time
+import hashlib
+import threading
 import redis
-from datetime import datetime, timedelta
-from typing import Optional
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
-from jose import JWTError, jwt
-from fastapi import HTTPException, status
+import jwt
+from jwt import InvalidTokenError
+from fastapi import BackgroundTasks, HTTPException, status
 
-from .models import User, UserSession, UserCreate, UserLogin
-from .database import get_db
+from .models import User, UserSession, UserCreate, UserLogin, utc_now
+from .database import get_db, SessionLocal
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing: new hashes are argon2id; existing bcrypt hashes still verify
+# (passlib picks the scheme from the hash prefix). AUTH_FAST_HASHING=1 switches
+# to cheap bcrypt rounds for tests and local scripts.
+if os.getenv("AUTH_FAST_HASHING") == "1":
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4)
+else:
+    pwd_context = CryptContext(
+        schemes=["argon2", "bcrypt"],
+        deprecated="auto",
+        argon2__time_cost=2,
+        argon2__memory_cost=19456,
+        argon2__parallelism=1,
+    )
+
+# How long a successful password check is remembered in Redis (seconds)
+PASSWORD_CACHE_TTL = 30
+
+# Length bounds for a well-formed access token (header.payload.signature);
+# ours are ~140-250 characters, anything outside is rejected without I/O
+TOKEN_MIN_LENGTH = 100
+TOKEN_MAX_LENGTH = 1024
+
+# Max number of decoded JWT payloads kept in-process
+TOKEN_CACHE_SIZE = 4096
+
+# In-process user lookups (by id and by username)
+USER_CACHE_SIZE = 10_000
+USER_CACHE_TTL = 30  # seconds
+
+class UserSnapshot(NamedTuple):
+    """Column values of a User row, safe to share between requests and threads"""
+    id: int
+    username: str
+    email: str
+    hashed_password: str
+    is_active: bool
+    is_superuser: bool
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    def to_user(self) -> User:
+        """A fresh detached User, so no caller shares or mutates a cached instance"""
+        return User(**self._asdict())
+
+# Columns selected by AuthService._load_user, in UserSnapshot field order
+_USER_COLUMNS = tuple(getattr(User, field) for field in UserSnapshot._fields)
+# Columns filled in on INSERT, returned by AuthService.create_user
+_GENERATED_USER_COLUMNS = (User.id, User.is_active, User.is_superuser, User.created_at, User.updated_at)
 
 class AuthService:
     def __init__(self, redis_client: redis.Redis, secret_key: str, algorithm: str = "HS256"):
         self.redis_client = redis_client
         self.secret_key = secret_key
         self.algorithm = algorithm
+        # Encoded once; PyJWT and hmac take the key as bytes
+        self._signing_key = secret_key.encode()
         self.access_token_expire_minutes = 30
 
+        # In-process LRU of decoded token payloads, evicted on 'exp'
+        self._token_cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._token_cache_lock = threading.Lock()
+
+        # In-process LRU of user rows keyed by ("id", id) / ("username", name): (snapshot, expires_at)
+        self._user_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._user_cache_lock = threading.Lock()
+
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         return pwd_context.verify(plain_password, hashed_password)
 
@@ -27,48 +92,156 @@ class AuthService:
         return pwd_context.hash(password)
 
     def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None):
-        to_encode = data.copy()
+        # JWT 'exp' is a POSIX integer, so encode it straight from time.time()
         if expires_delta:
-            expire = datetime.utcnow() + expires_delta
+            expire_ts = time.time() + expires_delta.total_seconds()
         else:
-            expire = datetime.utcnow() + timedelta(minutes=self.access_token_expire_minutes)
-        
-        to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
+            expire_ts = time.time() + self.access_token_expire_minutes * 60
+
+        to_encode = {**data, "exp": int(expire_ts)}
+        encoded_jwt = jwt.encode(to_encode, self._signing_key, algorithm=self.algorithm)
+        # Naive UTC, like the user_sessions.expires_at column
+        expire = datetime.fromtimestamp(expire_ts, timezone.utc).replace(tzinfo=None)
         return encoded_jwt, expire
 
     def verify_token(self, token: str) -> Optional[dict]:
-        try:
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        payload = self._get_cached_token(token)
+        if payload is not None:
             return payload
-        except JWTError:
+        try:
+            payload = jwt.decode(token, self._signing_key, algorithms=[self.algorithm])
+        except InvalidTokenError:
             return None
+        self._cache_token(token, payload)
+        return payload
+
+    def _get_cached_token(self, token: str) -> Optional[dict]:
+        with self._token_cache_lock:
+            payload = self._token_cache.get(token)
+            if payload is None:
+                return None
+            if payload.get("exp", 0) <= time.time():
+                del self._token_cache[token]
+                return None
+            self._token_cache.move_to_end(token)
+            return payload
+
+    def _cache_token(self, token: str, payload: dict):
+        with self._token_cache_lock:
+            self._token_cache[token] = payload
+            self._token_cache.move_to_end(token)
+            if len(self._token_cache) > TOKEN_CACHE_SIZE:
+                self._token_cache.popitem(last=False)
+
+    def _evict_token(self, token: str):
+        with self._token_cache_lock:
+            self._token_cache.pop(token, None)
 
     def get_user_by_username(self, db: Session, username: str) -> Optional[User]:
-        return db.query(User).filter(User.username == username).first()
+        user = self._get_cached_user(("username", username))
+        if user is not None:
+            return user
+        return self._load_user(db, User.username == username)
 
     def get_user_by_id(self, db: Session, user_id: int) -> Optional[User]:
-        return db.query(User).filter(User.id == user_id).first()
+        user = self._get_cached_user(("id", user_id))
+        if user is not None:
+            return user
+        return self._load_user(db, User.id == user_id)
+
+    def _load_user(self, db: Session, criterion) -> Optional[User]:
+        """Select just the UserSnapshot columns and return a detached User.
+
+        Plain column rows skip ORM entity loading and the identity map; the
+        statement shape is fixed, so SQLAlchemy reuses its compiled form.
+        """
+        row = db.execute(select(*_USER_COLUMNS).where(criterion)).first()
+        # Misses are not cached, so a new signup is visible immediately
+        if row is None:
+            return None
+        snapshot = UserSnapshot(*row)
+        self._cache_snapshot(snapshot)
+        return snapshot.to_user()
+
+    def _get_cached_user(self, key: tuple) -> Optional[User]:
+        with self._user_cache_lock:
+            entry = self._user_cache.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._user_cache[key]
+                return None
+            self._user_cache.move_to_end(key)
+            return entry[0].to_user()
 
-    def create_user(self, db: Session, user: UserCreate) -> User:
+    def _cache_snapshot(self, snapshot: UserSnapshot):
+        entry = (snapshot, time.monotonic() + USER_CACHE_TTL)
+        with self._user_cache_lock:
+            for key in (("id", snapshot.id), ("username", snapshot.username)):
+                self._user_cache[key] = entry
+                self._user_cache.move_to_end(key)
+            while len(self._user_cache) > USER_CACHE_SIZE:
+                self._user_cache.popitem(last=False)
+
+    def create_user(self, db: Session, user: UserCreate) -> Optional[User]:
+        """Create a user; returns None if the username or email is already taken"""
         hashed_password = self.get_password_hash(user.password)
-        db_user = User(
+        values = dict(
             username=user.username,
             email=user.email,
             hashed_password=hashed_password
         )
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
-        return db_user
+
+        if db.get_bind().dialect.name == "postgresql":
+            # Concurrent duplicate signups resolve without an IntegrityError
+            stmt = pg_insert(User).values(**values).on_conflict_do_nothing()
+        else:
+            stmt = insert(User).values(**values)
+
+        # Single round-trip: RETURNING only the server/default-generated columns.
+        # An ORM entity would be expired by commit and re-SELECTed on first access.
+        try:
+            row = db.execute(stmt.returning(*_GENERATED_USER_COLUMNS)).one_or_none()
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return None
+        if row is None:
+            return None
+
+        snapshot = UserSnapshot(**values, **row._mapping)
+        self._cache_snapshot(snapshot)
+        return snapshot.to_user()
+
+    def _password_cache_key(self, user: User, password: str) -> str:
+        # Keyed on the stored hash too, so changing the password invalidates the entry
+        message = f"{user.username}:{user.hashed_password}:{password}".encode()
+        digest = hmac.new(self._signing_key, message, hashlib.sha256).hexdigest()
+        return f"pwdok:{digest}"
 
     def authenticate_user(self, db: Session, username: str, password: str) -> Optional[User]:
         user = self.get_user_by_username(db, username)
-        if not user or not self.verify_password(password, user.hashed_password):
+        if not user:
+            return None
+
+        # Skip the bcrypt KDF for a recently verified password; failures are never cached
+        cache_key = self._password_cache_key(user, password)
+        try:
+            if self.redis_client.get(cache_key) == "1":
+                return user
+        except redis.RedisError:
+            pass
+
+        if not self.verify_password(password, user.hashed_password):
             return None
+
+        try:
+            self.redis_client.setex(cache_key, PASSWORD_CACHE_TTL, "1")
+        except redis.RedisError:
+            pass
         return user
 
-    def login_user(self, db: Session, login_data: UserLogin) -> dict:
+    def login_user(self, db: Session, login_data: UserLogin, background_tasks: Optional[BackgroundTasks] = None) -> dict:
         user = self.authenticate_user(db, login_data.username, login_data.password)
         if not user:
             raise HTTPException(
@@ -87,30 +260,31 @@ class AuthService:
             data={"sub": user.username, "user_id": user.id}
         )
 
-        # Store session in Redis
+        # Store session in Redis as a hash of scalar fields (no JSON encode/decode)
         session_data = {
             "user_id": user.id,
             "username": user.username,
             "expires_at": expire_time.isoformat(),
-            "is_active": user.is_active,
-            "is_superuser": user.is_superuser
+            "is_active": int(user.is_active),
+            "is_superuser": int(user.is_superuser)
         }
         
-        # Store in Redis with expiration
-        self.redis_client.setex(
-            f"session:{access_token}",
-            timedelta(minutes=self.access_token_expire_minutes),
-            json.dumps(session_data)
-        )
+        # Store in Redis with expiration, plus the per-user token index, in one round-trip
+        ttl = timedelta(minutes=self.access_token_expire_minutes)
+        user_sessions_key = f"user_sessions:{user.id}"
+        session_key = f"session:{access_token}"
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.hset(session_key, mapping=session_data)
+            pipe.expire(session_key, ttl)
+            pipe.sadd(user_sessions_key, access_token)
+            pipe.expire(user_sessions_key, ttl)
+            pipe.execute()
 
-        # Also store in database as backup
-        db_session = UserSession(
-            user_id=user.id,
-            session_token=access_token,
-            expires_at=expire_time
-        )
-        db.add(db_session)
-        db.commit()
+        # Also store in database as backup - off the response path when possible
+        if background_tasks is not None:
+            background_tasks.add_task(self._persist_session, user.id, access_token, expire_time)
+        else:
+            self._persist_session(user.id, access_token, expire_time, db)
 
         return {
             "access_token": access_token,
@@ -119,19 +293,45 @@ class AuthService:
             "user": user
         }
 
+    def _persist_session(self, user_id: int, token: str, expires_at: datetime, db: Optional[Session] = None):
+        """Write the backup UserSession row; opens its own session when run as a background task"""
+        owns_session = db is None
+        if owns_session:
+            db = SessionLocal()
+        try:
+            db.add(UserSession(user_id=user_id, session_token=token, expires_at=expires_at))
+            db.commit()
+        finally:
+            if owns_session:
+                db.close()
+
     def get_current_user(self, db: Session, token: str) -> Optional[User]:
-        # First check Redis
-        session_data = self.redis_client.get(f"session:{token}")
-        if session_data:
-            session_info = json.loads(session_data)
-            user_id = session_info["user_id"]
-            return self.get_user_by_id(db, user_id)
+        # Malformed tokens (scanners, garbage headers) never reach Redis or Postgres
+        if token.count(".") != 2 or not TOKEN_MIN_LENGTH < len(token) < TOKEN_MAX_LENGTH:
+            return None
+
+        # Same-process hit: token was already verified and has not expired
+        payload = self._get_cached_token(token)
+        if payload is not None and payload.get("user_id") is not None:
+            return self.get_user_by_id(db, payload["user_id"])
+
+        # Then check Redis. The session only maps the token to a user id; the user's
+        # flags come from get_user_by_id (USER_CACHE_TTL cache, then Postgres), so a
+        # deactivated or demoted user loses access within USER_CACHE_TTL seconds
+        user_id = self._get_session_field(token, "user_id")
+        if user_id:
+            return self.get_user_by_id(db, int(user_id))
         
         # Fallback to JWT verification
         payload = self.verify_token(token)
         if payload is None:
             return None
         
+        # Tokens carry the user id, so resolve by primary key
+        user_id = payload.get("user_id")
+        if user_id is not None:
+            return self.get_user_by_id(db, user_id)
+
         username = payload.get("sub")
         if username is None:
             return None
@@ -139,16 +339,45 @@ class AuthService:
         user = self.get_user_by_username(db, username)
         return user
 
+    def _get_session_field(self, token: str, field: str) -> Optional[str]:
+        try:
+            return self.redis_client.hget(f"session:{token}", field)
+        except redis.ResponseError:
+            # Pre-hash sessions were plain JSON strings; treat them as a miss until they expire
+            return None
+
     def logout_user(self, db: Session, token: str):
+        self._evict_token(token)
+
         # Remove from Redis
-        self.redis_client.delete(f"session:{token}")
+        user_id = self._get_session_field(token, "user_id")
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.delete(f"session:{token}")
+            if user_id:
+                pipe.srem(f"user_sessions:{user_id}", token)
+            pipe.execute()
         
-        # Remove from database
-        db.query(UserSession).filter(UserSession.session_token == token).delete()
+        # Remove from database; one DELETE by the unique token, no in-session sync
+        db.execute(
+            delete(UserSession).where(UserSession.session_token == token),
+            execution_options={"synchronize_session": False}
+        )
         db.commit()
 
-    def cleanup_expired_sessions(self, db: Session):
-        """Clean up expired sessions from database"""
-        now = datetime.utcnow()
-        db.query(UserSession).filter(UserSession.expires_at < now).delete()
-        db.commit()
\ No newline at end of file
+    def cleanup_expired_sessions(self, db: Session, batch_size: int = 10_000) -> int:
+        """Clean up expired sessions from database in bounded batches"""
+        now = utc_now()
+        deleted = 0
+        while True:
+            ids = db.execute(
+                select(UserSession.id)
+                .where(UserSession.expires_at < now)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not ids:
+                break
+            db.execute(delete(UserSession).where(UserSession.id.in_(ids)))
+            db.commit()
+            deleted += len(ids)
+        return deleted
@@ -1,8 +1,18 @@
+import csv
+import io
+import json
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from sqlalchemy import delete, insert, select
+from sqlalchemy.engine import RowMapping
 from sqlalchemy.orm import Session
+from auth.models import utc_now
 from .models import ChatSession, ChatMessage
 
+# Batches at least this large are loaded with COPY on PostgreSQL
+COPY_THRESHOLD = 100
+
+_MESSAGE_COLUMNS = ("chat_session_id", "user_id", "role", "content", "message_metadata", "created_at")
+
 class ChatService:
     def create_session(self, db: Session, user_id: Optional[int], title: Optional[str] = None) -> ChatSession:
         session = ChatSession(user_id=user_id, title=title)
@@ -22,29 +32,116 @@ class ChatService:
         content: str,
         user_id: Optional[int] = None,
         metadata: Optional[Dict[str, Any]] = None,
-    ) -> ChatMessage:
-        message = ChatMessage(
-            chat_session_id=chat_session_id,
-            user_id=user_id,
-            role=role,
-            content=content,
-            message_metadata=metadata or {},
-        )
-        db.add(message)
+    ) -> int:
+        """Persist a single message and return its id (thin wrapper around add_messages)"""
+        return self.add_messages(db, [{
+            "chat_session_id": chat_session_id,
+            "role": role,
+            "content": content,
+            "user_id": user_id,
+            "metadata": metadata,
+        }])[0]
+
+    def add_messages(self, db: Session, items: List[Dict[str, Any]]) -> List[int]:
+        """Insert many messages in a single round-trip and return their ids.
+
+        Each item takes the same keys as add_message's arguments.
+        """
+        if not items:
+            return []
+        rows = [self._message_row(item) for item in items]
+        # sort_by_parameter_order: batched insertmanyvalues returns ids in input order
+        stmt = insert(ChatMessage).returning(ChatMessage.id, sort_by_parameter_order=True)
+        ids = list(db.scalars(stmt, rows))
         db.commit()
-        db.refresh(message)
-        return message
+        return ids
+
+    def copy_messages(self, db: Session, items: List[Dict[str, Any]]) -> int:
+        """Bulk-load messages with COPY and return the number of rows written.
+
+        COPY cannot report generated ids, so use this for imports only. Small
+        batches and non-PostgreSQL databases go through add_messages instead.
+        """
+        if len(items) < COPY_THRESHOLD or db.get_bind().dialect.name != "postgresql":
+            return len(self.add_messages(db, items))
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for item in items:
+            row = self._message_row(item)
+            writer.writerow([
+                row["chat_session_id"],
+                "" if row["user_id"] is None else row["user_id"],
+                row["role"],
+                row["content"],
+                json.dumps(row["message_metadata"]),
+                row["created_at"].isoformat(),
+            ])
+        buffer.seek(0)
+
+        cursor = db.connection().connection.cursor()
+        try:
+            # Pooled connections may carry a short statement_timeout (DB_STATEMENT_TIMEOUT_MS);
+            # lift it for this transaction only, so a large import is not cancelled
+            cursor.execute("SET LOCAL statement_timeout = 0")
+            cursor.copy_expert(
+                # csv.writer leaves empty strings unquoted and COPY reads those as NULL;
+                # FORCE_NOT_NULL keeps an empty role/content an empty string
+                f"COPY chat_messages ({', '.join(_MESSAGE_COLUMNS)}) FROM STDIN "
+                "WITH (FORMAT csv, FORCE_NOT_NULL (role, content))",
+                buffer,
+            )
+        finally:
+            cursor.close()
+        db.commit()
+        return len(items)
+
+    @staticmethod
+    def _message_row(item: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "chat_session_id": item["chat_session_id"],
+            "user_id": item.get("user_id"),
+            "role": item["role"],
+            "content": item["content"],
+            "message_metadata": item.get("metadata") or {},
+            "created_at": utc_now(),
+        }
+
+    def list_messages(
+        self,
+        db: Session,
+        chat_session_id: int,
+        limit: int = 200,
+        include_metadata: bool = True,
+    ) -> List[RowMapping]:
+        """Fetch a session's messages in id order as read-only row mappings.
 
-    def list_messages(self, db: Session, chat_session_id: int, limit: int = 200) -> List[ChatMessage]:
-        return (
-            db.query(ChatMessage)
-            .filter(ChatMessage.chat_session_id == chat_session_id)
+        Selects plain columns rather than ChatMessage entities, so rows skip
+        ORM identity-map and instrumentation overhead. Pass
+        include_metadata=False to leave out the JSON metadata column.
+        """
+        columns = [
+            ChatMessage.id,
+            ChatMessage.chat_session_id,
+            ChatMessage.user_id,
+            ChatMessage.role,
+            ChatMessage.content,
+            ChatMessage.created_at,
+        ]
+        if include_metadata:
+            columns.append(ChatMessage.message_metadata)
+        stmt = (
+            select(*columns)
+            .where(ChatMessage.chat_session_id == chat_session_id)
             .order_by(ChatMessage.id.asc())
             .limit(limit)
-            .all()
         )
+        return db.execute(stmt).mappings().all()
 
     def delete_session(self, db: Session, session_id: int) -> None:
-        db.query(ChatMessage).filter(ChatMessage.chat_session_id == session_id).delete()
-        db.query(ChatSession).filter(ChatSession.id == session_id).delete()
+        # chat_messages.chat_session_id is ON DELETE CASCADE, so PostgreSQL
+        # removes the messages as part of the single session DELETE
+        if db.get_bind().dialect.name != "postgresql":
+            db.execute(delete(ChatMessage).where(ChatMessage.chat_session_id == session_id))
+        db.execute(delete(ChatSession).where(ChatSession.id == session_id))
         db.commit()
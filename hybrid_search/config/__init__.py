@@ -1,5 +1,5 @@
 """Configuration package for the hybrid search system."""
 
-from .settings import SearchConfig
+from .settings import SearchConfig, get_config
 
-__all__ = ["SearchConfig"] 
\ No newline at end of file
+__all__ = ["SearchConfig", "get_config"] 
\ No newline at end of file
@@ -1,27 +1,65 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 import os
+import re
 import logging
 
-@dataclass
+# Configure logging once per process rather than on every SearchConfig build
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(
+        level=getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+logger = logging.getLogger(__name__)
+
+# Placeholder values that mean "no key configured"
+_PLACEHOLDER_API_KEYS = frozenset({
+    'mock_api_key_for_testing',
+    'your_api_key_here',
+    'your_actual_gemini_api_key_here',
+    '',
+})
+
+# Google API keys: 'AIza' followed by 35 URL-safe characters
+_GEMINI_KEY_RE = re.compile(r'^AIza[0-9A-Za-z_\-]{35}$')
+
+def _opensearch_scheme() -> str:
+    return os.getenv('OPENSEARCH_SCHEME', 'http')
+
+def _default_opensearch_hosts() -> List[Dict[str, Any]]:
+    """Build OpenSearch hosts from environment variables"""
+    return [{
+        'host': os.getenv('OPENSEARCH_HOST', 'opensearch'),
+        'port': int(os.getenv('OPENSEARCH_PORT', '9200')),
+        'use_ssl': _opensearch_scheme() == 'https'
+    }]
+
+@dataclass(frozen=True, slots=True)
 class SearchConfig:
     """Enhanced configuration for the hybrid search system"""
 
     # OpenSearch settings
-    opensearch_hosts: List[Dict[str, Any]] = None
+    opensearch_hosts: List[Dict[str, Any]] = field(default_factory=_default_opensearch_hosts)
     opensearch_timeout: int = 30
     opensearch_max_retries: int = 10
-    opensearch_use_ssl: bool = False
+    opensearch_use_ssl: bool = field(default_factory=lambda: _opensearch_scheme() == 'https')
     opensearch_verify_certs: bool = False
 
     # Model settings
     embedding_model: str = 'all-MiniLM-L6-v2'
+    embed_batch_size: int = 64
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | fp16 | onnx
+    embedding_onnx_file: Optional[str] = os.getenv("EMBEDDING_ONNX_FILE")
     gemini_api_key: Optional[str] = os.getenv("GEMINI_API_KEY", "mock_api_key_for_testing")
 
     # Search settings
     default_search_method: str = "multi_stage"
     default_num_results: int = 5
     search_size: int = 500
+    bm25_preanalyze: bool = False  # analyze BM25 queries once client-side and cache the tokens
+    search_pool_workers: int = 32  # threads for the BM25 half of concurrent vector+BM25 searches
 
     # Context window settings
     max_context_tokens: int = 8000
@@ -37,56 +75,32 @@ class SearchConfig:
     max_retries: int = 1
 
     # Logging
-    log_level: str = "INFO"
+    log_level: str = os.getenv("LOG_LEVEL", "INFO")
     
     # Feature flags
     enable_dspy: bool = False
     enable_llamaindex: bool = False
     
     def __post_init__(self):
-        """Initialize configuration after creation"""
-        # Set up logging
-        logging.basicConfig(
-            level=getattr(logging, self.log_level.upper()),
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        
-        # Configure OpenSearch hosts from environment variables
-        if self.opensearch_hosts is None:
-            host = os.getenv('OPENSEARCH_HOST', 'opensearch')
-            port = int(os.getenv('OPENSEARCH_PORT', '9200'))
-            scheme = os.getenv('OPENSEARCH_SCHEME', 'http')
-            
-            self.opensearch_hosts = [{
-                'host': host,
-                'port': port,
-                'use_ssl': scheme == 'https'
-            }]
-            
-            # Update SSL settings based on scheme
-            self.opensearch_use_ssl = scheme == 'https'
-            
-        print(f"🔍 OpenSearch configured: {self.opensearch_hosts}")
-
-        # Get Gemini API key from environment
-        if self.gemini_api_key is None:
-            self.gemini_api_key = (
+        """Resolve the Gemini API key (the dataclass is frozen, so use object.__setattr__)"""
+        api_key = self.gemini_api_key
+        if api_key is None:
+            api_key = (
                 os.getenv('GEMINI_API_KEY') or
                 os.getenv('GOOGLE_API_KEY') or
                 os.getenv('GOOGLE_GEMINI_API_KEY')
             )
 
-        # Validate and clean up API key
-        if self.gemini_api_key:
-            self.gemini_api_key = self.gemini_api_key.strip()
-            if self.gemini_api_key in ['mock_api_key_for_testing', 'your_api_key_here', 'your_actual_gemini_api_key_here', '']:
-                print("⚠️ Please set a valid Gemini API key in your environment")
-                self.gemini_api_key = None
-            elif not self.gemini_api_key.startswith('AIza'):
-                print(f"⚠️ Warning: Gemini API key should start with 'AIza'")
+        # Clean up API key and drop known placeholders
+        if api_key:
+            api_key = api_key.strip()
+            if api_key in _PLACEHOLDER_API_KEYS:
+                api_key = None
 
-    def validate_config(self) -> bool:
-        """Validate configuration settings"""
+        object.__setattr__(self, 'gemini_api_key', api_key)
+
+    def _collect_issues(self):
+        """Return (issues, warnings) for the current settings"""
         issues = []
         warnings = []
 
@@ -101,71 +115,94 @@ class SearchConfig:
             issues.append("Invalid max_context_tokens value")
 
         # Warnings
+        if self.gemini_api_key and not _GEMINI_KEY_RE.match(self.gemini_api_key):
+            warnings.append("Gemini API key does not look like a Google API key ('AIza' + 35 characters)")
+
         if self.min_request_interval < 0.5:
             warnings.append("Very low rate limit interval - may hit API limits")
 
-        # Display results
-        if warnings:
-            print("⚠️ Configuration warnings:")
-            for warning in warnings:
-                print(f"  - {warning}")
+        return issues, warnings
+
+    @property
+    def is_valid(self) -> bool:
+        """True when there are no critical configuration issues (no logging)"""
+        return not self._collect_issues()[0]
+
+    def validate_config(self) -> bool:
+        """Validate configuration settings"""
+        issues, warnings = self._collect_issues()
+
+        # Report results
+        for warning in warnings:
+            logger.warning(f"⚠️ Configuration warning: {warning}")
 
         if issues:
-            print("❌ Configuration issues found:")
             for issue in issues:
-                print(f"  - {issue}")
+                logger.error(f"❌ Configuration issue: {issue}")
             return False
 
-        print("✅ Configuration validation passed")
+        logger.info("✅ Configuration validation passed")
         return True
 
     def display_config(self):
         """Display current configuration (hiding sensitive data)"""
-        print("\n📋 Current Configuration:")
-        print(f"  OpenSearch: {self.opensearch_hosts}")
-        print(f"  Embedding Model: {self.embedding_model}")
-        
         if self.gemini_api_key:
-            masked_key = f"{self.gemini_api_key[:10]}...{self.gemini_api_key[-4:]}"
-            print(f"  Gemini API Key: {masked_key} ✅")
+            masked_key = f"{self.gemini_api_key[:10]}...{self.gemini_api_key[-4:]} ✅"
         else:
-            print(f"  Gemini API Key: ❌ Not Set")
-            
-        print(f"  Search Method: {self.default_search_method}")
-        print(f"  Max Context Tokens: {self.max_context_tokens}")
-        print(f"  Rate Limit Interval: {self.min_request_interval}s")
-        print(f"  Log Level: {self.log_level}")
+            masked_key = "❌ Not Set"
+
+        logger.info(
+            "📋 Current Configuration:\n"
+            f"  OpenSearch: {self.opensearch_hosts}\n"
+            f"  Embedding Model: {self.embedding_model}\n"
+            f"  Gemini API Key: {masked_key}\n"
+            f"  Search Method: {self.default_search_method}\n"
+            f"  Max Context Tokens: {self.max_context_tokens}\n"
+            f"  Rate Limit Interval: {self.min_request_interval}s\n"
+            f"  Log Level: {self.log_level}"
+        )
 
     def wait_for_services(self, max_wait_time: int = 60):
         """Wait for required services to be available"""
         import time
-        import requests
         from opensearchpy import OpenSearch
         
-        print("🔄 Waiting for services to be ready...")
+        logger.info("🔄 Waiting for services to be ready...")
+        
+        # One client for all probes so the pooled connection is reused between attempts
+        client = OpenSearch(
+            hosts=self.opensearch_hosts,
+            timeout=2,
+            max_retries=0,
+            use_ssl=self.opensearch_use_ssl,
+            verify_certs=self.opensearch_verify_certs,
+            ssl_show_warn=False,
+            http_compress=True,
+        )
         
-        # Wait for OpenSearch
-        opensearch_ready = False
         start_time = time.time()
+        attempt = 0
         
-        while not opensearch_ready and (time.time() - start_time) < max_wait_time:
+        while True:
             try:
-                host_config = self.opensearch_hosts[0]
-                url = f"http://{host_config['host']}:{host_config['port']}/_cluster/health"
-                response = requests.get(url, timeout=5)
-                if response.status_code == 200:
-                    opensearch_ready = True
-                    print("✅ OpenSearch is ready")
-                else:
-                    print(f"⏳ OpenSearch not ready yet (status: {response.status_code})")
+                if client.ping():
+                    logger.info("✅ OpenSearch is ready")
+                    return True
+                logger.debug("⏳ OpenSearch not ready yet")
             except Exception as e:
-                print(f"⏳ Waiting for OpenSearch... ({str(e)[:50]})")
+                logger.debug(f"⏳ Waiting for OpenSearch... ({str(e)[:50]})")
             
-            if not opensearch_ready:
-                time.sleep(2)
+            remaining = max_wait_time - (time.time() - start_time)
+            if remaining <= 0:
+                break
+            # Exponential backoff: 1, 2, 4, 8, capped at 10s and the remaining budget
+            time.sleep(min(2 ** attempt, 10, remaining))
+            attempt += 1
         
-        if not opensearch_ready:
-            print("❌ OpenSearch failed to start within timeout period")
-            return False
-            
-        return True
\ No newline at end of file
+        logger.error("❌ OpenSearch failed to start within timeout period")
+        return False
+
+@lru_cache(maxsize=1)
+def get_config() -> SearchConfig:
+    """Return the process-wide SearchConfig, built from the environment once"""
+    return SearchConfig()
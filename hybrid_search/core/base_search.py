@@ -1,24 +1,92 @@
 from opensearchpy import OpenSearch
+from opensearchpy.exceptions import ConnectionError as OpenSearchConnectionError, SerializationError
+from opensearchpy.serializer import JSONSerializer
+try:
+    from opensearchpy import AsyncOpenSearch
+    from opensearchpy.helpers import async_bulk
+except ImportError:  # aiohttp not installed
+    AsyncOpenSearch = None
+    async_bulk = None
+import orjson
 from sentence_transformers import SentenceTransformer
-import google.generativeai as genai
 from typing import List, Dict, Any, Optional, Tuple
+import os
 import time
+import hashlib
+import threading
 import tiktoken
 import numpy as np
 import logging
 import requests
 from contextlib import asynccontextmanager
 import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 from config.settings import SearchConfig
+from utils.gemini import get_genai
+
+# Max number of query embeddings kept in-process
+QUERY_EMBED_CACHE_SIZE = 4096
+
+# Max number of analyzed BM25 queries kept in-process
+ANALYZE_CACHE_SIZE = 4096
+
+# Fields returned with each search hit; never ship the stored vectors back
+HIT_SOURCE = {"includes": ["passage_text", "metadata"], "excludes": ["passage_embedding"]}
+
+def _term_filter(field: str, value: Any) -> Dict:
+    return {"term": {field: value}}
+
+def _terms_filter(field: str, value: List) -> Dict:
+    return {"terms": {field: value}}
+
+def _range_filter(field: str, value: Dict) -> Optional[Dict]:
+    # Dicts other than {"range": ...} are ignored
+    return {"range": {field: value['range']}} if 'range' in value else None
+
+# Filter clause builders keyed by filter value type
+_FILTER_BUILDERS = {
+    list: _terms_filter,
+    dict: _range_filter,
+}
+
+# faiss scalar quantization: vectors stored as fp16 instead of fp32
+FAISS_FP16_ENCODER = {"name": "sq", "parameters": {"type": "fp16"}}
+
+class OrjsonSerializer(JSONSerializer):
+    """OpenSearch serializer that writes numpy vectors natively via orjson"""
+
+    def dumps(self, data):
+        if isinstance(data, str):
+            return data
+        try:
+            return orjson.dumps(data, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        except TypeError as e:
+            raise SerializationError(data, e)
+
+    def loads(self, s):
+        return orjson.loads(s)
 
 class BaseSearchEngine:
     """Enhanced base class for search functionality with HNSW support and connection handling"""
     
+    # Constant part of every search body; requests spread it and add size/query
+    _BODY_TMPL = {"_source": HIT_SOURCE, "track_total_hits": False}
+    
     def __init__(self, config: SearchConfig):
         self.config = config
         self.logger = logging.getLogger(__name__)
         
+        # Resolve the OpenSearch timeout once ("30s" or 30 -> 30)
+        timeout = config.opensearch_timeout
+        self._timeout_s = int(timeout.replace('s', '')) if isinstance(timeout, str) else int(timeout)
+        self._timeout_str = f"{self._timeout_s}s"
+        
+        # A successful health check is trusted for this many seconds
+        self._health_ttl = 5.0
+        self._last_health_ok = 0.0
+        
         # Wait for services to be ready
         if not config.wait_for_services():
             self.logger.warning("⚠️ Services may not be fully ready")
@@ -28,11 +96,30 @@ class BaseSearchEngine:
         # Initialize embedding model with error handling
         self._init_embedding_model()
         
+        # LRU of query embeddings keyed by a hash of the query text
+        self._query_embed_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._query_embed_cache_lock = threading.Lock()
+        
+        # LRU of analyzer output for BM25 queries (only used with bm25_preanalyze)
+        self._analyze_cache: "OrderedDict[Tuple[str, bytes], List[str]]" = OrderedDict()
+        self._analyze_cache_lock = threading.Lock()
+        
+        # Runs the BM25 half of vector_and_bm25 while the caller runs the vector half;
+        # sized for concurrent requests, since each in-flight search holds one thread
+        self._search_pool = ThreadPoolExecutor(
+            max_workers=config.search_pool_workers, thread_name_prefix="opensearch"
+        )
+        
+        # Bumped on every write through this engine; result caches include it in their keys
+        self._index_generations: Dict[str, int] = {}
+        self._index_generations_lock = threading.Lock()
+        
         # Initialize Gemini with better error handling
         self._init_gemini()
         
         # Rate limiting and performance tracking
-        self.last_request_time = 0
+        self._next_allowed_ts = 0.0  # time.monotonic() of the next free Gemini slot
+        self._rate_limit_lock = threading.Lock()
         self.request_count = 0
         self.total_tokens_used = 0
         
@@ -46,27 +133,16 @@ class BaseSearchEngine:
         
         for attempt in range(max_retries):
             try:
-                # Ensure timeout is numeric
-                timeout = self.config.opensearch_timeout
-                if isinstance(timeout, str):
-                    timeout = int(timeout.replace('s', ''))
                 self.client = OpenSearch(
-                    hosts=self.config.opensearch_hosts,
-                    timeout=timeout,
-                    max_retries=self.config.opensearch_max_retries,
-                    retry_on_timeout=True,
-                    verify_certs=self.config.opensearch_verify_certs,
-                    ssl_assert_hostname=False,
-                    ssl_show_warn=False,
-                    use_ssl=self.config.opensearch_use_ssl,
+                    **self._opensearch_client_kwargs(),
                     # Add connection-specific timeout settings
                     connection_class=None,
-                    http_compress=True,
                 )
                 
                 # Test the connection with proper timeout
-                cluster_health = self.client.cluster.health(timeout=timeout)
+                cluster_health = self.client.cluster.health(timeout=self._timeout_str)
                 self.logger.info(f"✅ OpenSearch connected successfully: {cluster_health['status']}")
+                self._last_health_ok = time.monotonic()
                 return
                 
             except Exception as e:
@@ -78,16 +154,152 @@ class BaseSearchEngine:
                     self.logger.error("❌ Failed to connect to OpenSearch after all retries")
                     raise ConnectionError(f"Could not connect to OpenSearch: {e}")
 
+    def _opensearch_client_kwargs(self) -> Dict[str, Any]:
+        """Connection settings shared by the sync and async OpenSearch clients"""
+        return dict(
+            hosts=self.config.opensearch_hosts,
+            timeout=self._timeout_s,
+            max_retries=self.config.opensearch_max_retries,
+            retry_on_timeout=True,
+            verify_certs=self.config.opensearch_verify_certs,
+            ssl_assert_hostname=False,
+            ssl_show_warn=False,
+            use_ssl=self.config.opensearch_use_ssl,
+            http_compress=True,
+            serializer=OrjsonSerializer(),
+        )
+
     def _init_embedding_model(self):
         """Initialize embedding model with error handling"""
         try:
-            self.model = SentenceTransformer(self.config.embedding_model)
+            self.model = self._load_embedding_model()
             self.embedding_dimension = self.model.get_sentence_embedding_dimension()
             self.logger.info(f"✅ Embedding model loaded: {self.config.embedding_model} (dim: {self.embedding_dimension})")
         except Exception as e:
             self.logger.error(f"❌ Failed to load embedding model: {e}")
             raise
 
+    def _load_embedding_model(self) -> SentenceTransformer:
+        """Load the embedding model for the configured backend, falling back to FP32 torch"""
+        name = self.config.embedding_model
+        backend = self.config.embedding_backend.lower()
+        try:
+            if backend == "onnx":
+                # ONNX Runtime (needs sentence-transformers>=3.2 with the onnx extra)
+                model_kwargs = {"file_name": self.config.embedding_onnx_file} if self.config.embedding_onnx_file else None
+                model = SentenceTransformer(name, backend="onnx", model_kwargs=model_kwargs)
+                self.logger.info("⚡ Embedding model running on ONNX Runtime")
+                return model
+            if backend == "fp16":
+                import torch
+                if torch.cuda.is_available():
+                    model = SentenceTransformer(name, device="cuda", model_kwargs={"torch_dtype": torch.float16})
+                    self.logger.info("⚡ Embedding model running in FP16 on CUDA")
+                    return model
+                self.logger.warning("⚠️ FP16 embeddings need CUDA - using FP32 on CPU")
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not load {backend} embedding backend ({e}) - using FP32 torch")
+        return SentenceTransformer(name)
+
+    def _embed_query(self, text: str) -> np.ndarray:
+        """Embed a query as a normalized float32 vector, reused for repeated queries (read-only)"""
+        key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        with self._query_embed_cache_lock:
+            embedding = self._query_embed_cache.get(key)
+            if embedding is not None:
+                self._query_embed_cache.move_to_end(key)
+                return embedding
+
+        embedding = self.model.encode(text, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32, copy=False)
+        embedding.flags.writeable = False
+
+        with self._query_embed_cache_lock:
+            self._query_embed_cache[key] = embedding
+            if len(self._query_embed_cache) > QUERY_EMBED_CACHE_SIZE:
+                self._query_embed_cache.popitem(last=False)
+        return embedding
+
+    def _embed_queries(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed several queries, encoding the cache misses in one batched call"""
+        keys = [hashlib.blake2b(text.encode(), digest_size=16).digest() for text in texts]
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._query_embed_cache_lock:
+            for i, key in enumerate(keys):
+                embedding = self._query_embed_cache.get(key)
+                if embedding is not None:
+                    self._query_embed_cache.move_to_end(key)
+                    embeddings[i] = embedding
+
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if misses:
+            encoded = self.model.encode(
+                [texts[i] for i in misses],
+                batch_size=self.config.embed_batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            ).astype(np.float32, copy=False)
+            encoded.flags.writeable = False
+            with self._query_embed_cache_lock:
+                for i, embedding in zip(misses, encoded):
+                    embeddings[i] = embedding
+                    self._query_embed_cache[keys[i]] = embedding
+                while len(self._query_embed_cache) > QUERY_EMBED_CACHE_SIZE:
+                    self._query_embed_cache.popitem(last=False)
+        return embeddings
+
+    def _analyze_query_cached(self, index_name: str, text: str) -> List[str]:
+        """Run the index analyzer over a query once and remember the resulting tokens"""
+        key = (index_name, hashlib.blake2b(text.encode(), digest_size=16).digest())
+        with self._analyze_cache_lock:
+            tokens = self._analyze_cache.get(key)
+            if tokens is not None:
+                self._analyze_cache.move_to_end(key)
+                return tokens
+
+        response = self.client.indices.analyze(
+            index=index_name,
+            body={"analyzer": "custom_text_analyzer", "text": text}
+        )
+        tokens = [token['token'] for token in response.get('tokens', [])]
+
+        with self._analyze_cache_lock:
+            self._analyze_cache[key] = tokens
+            if len(self._analyze_cache) > ANALYZE_CACHE_SIZE:
+                self._analyze_cache.popitem(last=False)
+        return tokens
+
+    def _bm25_clause(self, index_name: str, query_text: str, size: int) -> Dict:
+        """BM25 match clause for passage_text
+        
+        With bm25_preanalyze on, large queries send cached pre-analyzed tokens
+        with the whitespace analyzer, so the server skips the custom analyzer
+        while still scoring each term with BM25.
+        """
+        if self.config.bm25_preanalyze and size >= 100:
+            try:
+                tokens = self._analyze_query_cached(index_name, query_text)
+                if tokens:
+                    return {
+                        "match": {
+                            "passage_text": {
+                                "query": " ".join(tokens),
+                                "analyzer": "whitespace",
+                                "operator": "or"
+                            }
+                        }
+                    }
+            except Exception as e:
+                self.logger.debug(f"Query pre-analysis failed, using server-side analysis: {e}")
+        return {
+            "match": {
+                "passage_text": {
+                    "query": query_text,
+                    "operator": "or"
+                }
+            }
+        }
+
     def _init_gemini(self):
         """Initialize Gemini with proper error handling"""
         if not self.config.gemini_api_key or self.config.gemini_api_key == "mock_api_key_for_testing":
@@ -96,6 +308,7 @@ class BaseSearchEngine:
             return
             
         try:
+            genai = get_genai()
             genai.configure(api_key=self.config.gemini_api_key)
             self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
             
@@ -122,14 +335,12 @@ class BaseSearchEngine:
             self.tokenizer = None
 
     def ensure_connection(self):
-        """Ensure OpenSearch connection is healthy"""
+        """Ensure OpenSearch connection is healthy (cached for _health_ttl seconds)"""
+        if time.monotonic() - self._last_health_ok < self._health_ttl:
+            return True
         try:
-            # Use numeric timeout
-            timeout = self.config.opensearch_timeout
-            if isinstance(timeout, str):
-                timeout = int(timeout.replace('s', ''))
-            
-            self.client.cluster.health(timeout=f"{timeout}s")
+            self.client.cluster.health(timeout=self._timeout_str)
+            self._last_health_ok = time.monotonic()
             return True
         except Exception as e:
             self.logger.warning(f"OpenSearch connection lost, attempting to reconnect: {e}")
@@ -140,24 +351,78 @@ class BaseSearchEngine:
                 self.logger.error(f"Failed to reconnect to OpenSearch: {reconnect_e}")
                 return False
 
+    def index_generation(self, index_name: str) -> int:
+        """Write generation of an index (changes whenever this engine writes to it)"""
+        return self._index_generations.get(index_name, 0)
+    
+    def _bump_index_generation(self, index_name: str):
+        with self._index_generations_lock:
+            self._index_generations[index_name] = self._index_generations.get(index_name, 0) + 1
+
+    def _with_reconnect(self, call):
+        """Run an OpenSearch call; on a dropped connection reconnect once and retry"""
+        try:
+            return call()
+        except OpenSearchConnectionError as e:
+            self.logger.warning(f"OpenSearch connection lost, attempting to reconnect: {e}")
+            self._last_health_ok = 0.0
+            self._init_opensearch()
+            return call()
+
+    def _search(self, index_name: str, body: Dict) -> Dict:
+        # The lambda re-reads self.client so the retry uses the reconnected client
+        return self._with_reconnect(lambda: self.client.search(index=index_name, body=body))
+
+    def _search_batch(self, index_name: str, bodies: List[Dict]) -> List[List[Dict]]:
+        """Run several search bodies in one _msearch round-trip; a failed body yields []"""
+        if not bodies:
+            return []
+        lines = []
+        for body in bodies:
+            lines.append({})  # header; the index comes from the URL
+            lines.append(body)
+        response = self._with_reconnect(lambda: self.client.msearch(index=index_name, body=lines))
+        results = []
+        for item in response['responses']:
+            if 'error' in item:
+                self.logger.error(f"❌ Error in batched search: {item['error']}")
+                results.append([])
+            else:
+                results.append(item['hits']['hits'])
+        return results
+
     def create_hnsw_index(self, index_name: str, dimension: Optional[int] = None, 
-                         m: int = 16, ef_construction: int = 200) -> bool:
-        """Create an index with optimized HNSW configuration"""
+                         m: int = 16, ef_construction: int = 200, ef_search: int = 100,
+                         engine: str = "faiss", encoder: Optional[Dict] = FAISS_FP16_ENCODER) -> bool:
+        """Create an index with optimized HNSW configuration
+        
+        Defaults to faiss with fp16 scalar quantization, which halves vector
+        memory; pass encoder=None for full-precision vectors or a "pq" encoder
+        for more compression. Re-check recall with optimize_hnsw_parameters
+        after changing the encoder.
+        """
         
         if not self.ensure_connection():
             return False
             
         if dimension is None:
             dimension = self.embedding_dimension
+        
+        method_parameters = {
+            "ef_construction": ef_construction,
+            "m": m
+        }
+        if encoder is not None:
+            method_parameters["encoder"] = encoder
             
         index_body = {
             "settings": {
                 "index": {
                     "knn": True,
-                    "knn.algo_param.ef_search": 100,
+                    "knn.algo_param.ef_search": ef_search,
                     "number_of_shards": 1,
                     "number_of_replicas": 0,
-                    "refresh_interval": "30",
+                    "refresh_interval": "30s",
                     "max_result_window": 10000
                 },
                 "analysis": {
@@ -183,11 +448,8 @@ class BaseSearchEngine:
                         "method": {
                             "name": "hnsw",
                             "space_type": "cosinesimil",
-                            "engine": "nmslib",
-                            "parameters": {
-                                "ef_construction": ef_construction,
-                                "m": m
-                            }
+                            "engine": engine,
+                            "parameters": method_parameters
                         }
                     },
                     "metadata": {
@@ -209,13 +471,11 @@ class BaseSearchEngine:
                 return True
                 
             response = self.client.indices.create(index=index_name, body=index_body)
+            self._bump_index_generation(index_name)
             self.logger.info(f"✅ Created HNSW index {index_name}")
             
             # Wait for index to be ready with proper timeout
-            timeout = self.config.opensearch_timeout
-            if isinstance(timeout, str):
-                timeout = int(timeout.replace('s', ''))
-            self.client.cluster.health(index=index_name, wait_for_status='yellow', timeout=f"{timeout}s")
+            self.client.cluster.health(index=index_name, wait_for_status='yellow', timeout=self._timeout_str)
             return True
             
         except Exception as e:
@@ -225,47 +485,50 @@ class BaseSearchEngine:
     def vector_search(self, index_name: str, query_text: str, size: int = 500, 
                      ef_search: Optional[int] = None) -> List[Dict]:
         """Perform HNSW-accelerated vector search"""
-        if not self.ensure_connection():
-            return []
-            
         try:
-            query_vector = self.model.encode(query_text).tolist()
-            
-            # Configure HNSW search parameters
-            knn_query = {
-                "vector": query_vector,
-                "k": size
-            }
-            
-            if ef_search:
-                knn_query["method_parameters"] = {"ef": ef_search}
-            
-            search_body = {
-                "size": size,
-                "query": {
-                    "knn": {
-                        "passage_embedding": knn_query
-                    }
-                },
-                "_source": ["passage_text", "metadata"]
-            }
-            
-            response = self.client.search(index=index_name, body=search_body)
+            query_vector = self._embed_query(query_text)
+            response = self._search(index_name, self._knn_body(query_vector, size, ef_search))
             return response['hits']['hits']
             
         except Exception as e:
             self.logger.error(f"❌ Error in HNSW vector search: {e}")
             return []
 
+    def vector_search_batch(self, index_name: str, queries: List[str], size: int = 500,
+                            ef_search: Optional[int] = None) -> List[List[Dict]]:
+        """Vector search for several queries: one embedding batch and one _msearch round-trip"""
+        try:
+            query_vectors = self._embed_queries(queries)
+            return self._search_batch(
+                index_name,
+                [self._knn_body(query_vector, size, ef_search) for query_vector in query_vectors]
+            )
+        except Exception as e:
+            self.logger.error(f"❌ Error in batched HNSW vector search: {e}")
+            return [[] for _ in queries]
+
+    def _knn_body(self, query_vector: np.ndarray, size: int, ef_search: Optional[int]) -> Dict:
+        # Configure HNSW search parameters
+        knn_query = {
+            "vector": query_vector,
+            "k": size
+        }
+        
+        if ef_search:
+            knn_query["method_parameters"] = {"ef": ef_search}
+        
+        return {
+            **self._BODY_TMPL,
+            "size": size,
+            "query": {"knn": {"passage_embedding": knn_query}}
+        }
+
     def hybrid_search(self, index_name: str, query_text: str, size: int = 500,
                      vector_weight: float = 0.7, text_weight: float = 0.3,
                      ef_search: Optional[int] = None) -> List[Dict]:
         """Perform hybrid search combining HNSW vector search and BM25"""
-        if not self.ensure_connection():
-            return []
-            
         try:
-            query_vector = self.model.encode(query_text).tolist()
+            query_vector = self._embed_query(query_text)
             
             # Configure HNSW parameters
             knn_params = {"vector": query_vector, "k": size}
@@ -274,6 +537,7 @@ class BaseSearchEngine:
             
             # Try hybrid query first
             hybrid_query = {
+                **self._BODY_TMPL,
                 "size": size,
                 "query": {
                     "hybrid": {
@@ -283,26 +547,18 @@ class BaseSearchEngine:
                                     "passage_embedding": knn_params
                                 }
                             },
-                            {
-                                "match": {
-                                    "passage_text": {
-                                        "query": query_text,
-                                        "operator": "or"
-                                    }
-                                }
-                            }
+                            self._bm25_clause(index_name, query_text, size)
                         ],
                         "combination": {
                             "technique": "arithmetic_mean",
                             "weights": [vector_weight, text_weight]
                         }
                     }
-                },
-                "_source": ["passage_text", "metadata"]
+                }
             }
             
             try:
-                response = self.client.search(index=index_name, body=hybrid_query)
+                response = self._search(index_name, hybrid_query)
                 return response['hits']['hits']
             except Exception as hybrid_e:
                 self.logger.warning(f"Hybrid search failed, falling back to separate searches: {hybrid_e}")
@@ -318,73 +574,80 @@ class BaseSearchEngine:
                                ef_search: Optional[int]) -> List[Dict]:
         """Fallback hybrid search using separate queries"""
         try:
-            vector_results = self.vector_search(index_name, query_text, size, ef_search)
-            bm25_results = self.bm25_search(index_name, query_text, size)
-            
-            # Combine and rerank results
-            combined_scores = {}
-            
-            # Add vector search scores
-            for i, hit in enumerate(vector_results):
-                doc_id = hit['_id']
-                vector_score = hit['_score'] * vector_weight
-                combined_scores[doc_id] = {
-                    'score': vector_score,
-                    'doc': hit,
-                    'vector_rank': i + 1
-                }
-            
-            # Add BM25 scores
-            for i, hit in enumerate(bm25_results):
-                doc_id = hit['_id']
-                bm25_score = hit['_score'] * text_weight
-                
-                if doc_id in combined_scores:
-                    combined_scores[doc_id]['score'] += bm25_score
-                    combined_scores[doc_id]['bm25_rank'] = i + 1
-                else:
-                    combined_scores[doc_id] = {
-                        'score': bm25_score,
-                        'doc': hit,
-                        'bm25_rank': i + 1
-                    }
-            
-            # Sort by combined score and return
-            sorted_results = sorted(combined_scores.values(), 
-                                  key=lambda x: x['score'], reverse=True)
-            
-            return [result['doc'] for result in sorted_results[:size]]
+            vector_results, bm25_results = self.vector_and_bm25(index_name, query_text, size, ef_search)
+            
+            hits = vector_results + bm25_results
+            if not hits:
+                return []
+            
+            # Weighted scores of both result lists, in one array
+            ids = np.array([hit['_id'] for hit in hits], dtype=object)
+            scores = np.fromiter((hit['_score'] for hit in hits), dtype=np.float64, count=len(hits))
+            scores[:len(vector_results)] *= vector_weight
+            scores[len(vector_results):] *= text_weight
+            
+            # Sum scores per document id
+            unique_ids, first_seen, inverse = np.unique(ids, return_index=True, return_inverse=True)
+            totals = np.zeros(len(unique_ids), dtype=np.float64)
+            np.add.at(totals, inverse, scores)
+            
+            # Top `size` by combined score; np.unique sorts ids, so rank from first-seen
+            # order with a stable sort to keep equal scores in the order they arrived
+            seen_order = np.argsort(first_seen)
+            top = seen_order[np.argsort(-totals[seen_order], kind='stable')][:size]
+            
+            # Prefer the vector hit when a document came back from both searches
+            hit_by_id = {}
+            for hit in hits:
+                hit_by_id.setdefault(hit['_id'], hit)
+            return [hit_by_id[unique_ids[i]] for i in top]
             
         except Exception as e:
             self.logger.error(f"❌ Error in fallback hybrid search: {e}")
             return []
 
+    def vector_and_bm25(self, index_name: str, query_text: str, size: int = 500,
+                        ef_search: Optional[int] = None) -> Tuple[List[Dict], List[Dict]]:
+        """Vector and BM25 search with overlapping round-trips (BM25 on the search pool, vector in the caller's thread)"""
+        bm25_future = self._search_pool.submit(self.bm25_search, index_name, query_text, size)
+        vector_results = self.vector_search(index_name, query_text, size, ef_search)
+        return vector_results, bm25_future.result()
+
+    def vector_and_bm25_batch(self, index_name: str, queries: List[str], size: int = 500,
+                              ef_search: Optional[int] = None) -> Tuple[List[List[Dict]], List[List[Dict]]]:
+        """vector_and_bm25 for several queries: one vector and one BM25 _msearch, overlapped the same way"""
+        bm25_future = self._search_pool.submit(self.bm25_search_batch, index_name, queries, size)
+        vector_results = self.vector_search_batch(index_name, queries, size, ef_search)
+        return vector_results, bm25_future.result()
+
     def bm25_search(self, index_name: str, query_text: str, size: int = 500) -> List[Dict]:
         """Perform BM25 text search"""
-        if not self.ensure_connection():
-            return []
-            
         try:
-            bm25_query = {
-                "size": size,
-                "query": {
-                    "match": {
-                        "passage_text": {
-                            "query": query_text,
-                            "operator": "or"
-                        }
-                    }
-                },
-                "_source": ["passage_text", "metadata"]
-            }
-            
-            response = self.client.search(index=index_name, body=bm25_query)
+            response = self._search(index_name, self._bm25_body(index_name, query_text, size))
             return response['hits']['hits']
             
         except Exception as e:
             self.logger.error(f"❌ Error in BM25 search: {e}")
             return []
 
+    def bm25_search_batch(self, index_name: str, queries: List[str], size: int = 500) -> List[List[Dict]]:
+        """BM25 search for several queries in one _msearch round-trip"""
+        try:
+            return self._search_batch(
+                index_name,
+                [self._bm25_body(index_name, query_text, size) for query_text in queries]
+            )
+        except Exception as e:
+            self.logger.error(f"❌ Error in batched BM25 search: {e}")
+            return [[] for _ in queries]
+
+    def _bm25_body(self, index_name: str, query_text: str, size: int) -> Dict:
+        return {
+            **self._BODY_TMPL,
+            "size": size,
+            "query": self._bm25_clause(index_name, query_text, size)
+        }
+
     async def bulk_index_documents(self, index_name: str, documents: List[Dict], 
                                   batch_size: int = 100) -> bool:
         """Bulk index documents with embeddings"""
@@ -393,25 +656,59 @@ class BaseSearchEngine:
             
         from opensearchpy.helpers import bulk
         
+        def embed_missing():
+            # Encode every document lacking an embedding in one batched call
+            pending = [doc for doc in documents if 'passage_embedding' not in doc]
+            if not pending:
+                return
+            embeddings = self.model.encode(
+                [doc['passage_text'] for doc in pending],
+                batch_size=self.config.embed_batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,  # index uses cosinesimil, so unit length is safe
+                show_progress_bar=False
+            )
+            for doc, embedding in zip(pending, embeddings):
+                doc['passage_embedding'] = embedding.tolist()
+        
         def generate_docs():
             for i, doc in enumerate(documents):
-                # Generate embedding if not provided
-                if 'passage_embedding' not in doc:
-                    doc['passage_embedding'] = self.model.encode(doc['passage_text']).tolist()
-                
                 yield {
                     '_index': index_name,
                     '_id': doc.get('id', i),
                     '_source': doc
                 }
         
+        def run_parallel_bulk():
+            # Several chunks in flight at once over the sync client's connection pool
+            # No periodic refreshes (segment flushes) while the load runs
+            previous_refresh = self._suspend_refresh(index_name)
+            try:
+                return self._bulk_ndjson(index_name, documents, batch_size, min(8, os.cpu_count() or 1))
+            finally:
+                self._restore_refresh(index_name, previous_refresh)
+        
         try:
-            success, failed = bulk(
-                self.client,
-                generate_docs(),
-                chunk_size=batch_size,
-                request_timeout=60
-            )
+            # Encoding is CPU-bound; keep it off the event loop
+            await asyncio.to_thread(embed_missing)
+            if len(documents) >= 2 * batch_size:
+                success, failed = await asyncio.to_thread(run_parallel_bulk)
+            elif AsyncOpenSearch is not None:
+                async with AsyncOpenSearch(**self._opensearch_client_kwargs()) as async_client:
+                    success, failed = await async_bulk(
+                        async_client,
+                        generate_docs(),
+                        chunk_size=batch_size,
+                        request_timeout=60
+                    )
+            else:
+                success, failed = await asyncio.to_thread(
+                    bulk,
+                    self.client,
+                    generate_docs(),
+                    chunk_size=batch_size,
+                    request_timeout=60
+                )
             
             self.logger.info(f"✅ Successfully indexed {success} documents, {len(failed)} failed")
             
@@ -422,16 +719,75 @@ class BaseSearchEngine:
         except Exception as e:
             self.logger.error(f"❌ Error bulk indexing: {e}")
             return False
+        finally:
+            # Even a failed load may have written some documents
+            self._bump_index_generation(index_name)
+
+    def _bulk_ndjson(self, index_name: str, documents: List[Dict], batch_size: int,
+                     thread_count: int) -> Tuple[int, List[Dict]]:
+        """Send documents as pre-encoded NDJSON chunks, several requests in flight
+        
+        Each chunk is serialized straight to bytes with orjson, skipping the
+        per-document action dicts and serializer calls of the bulk helpers.
+        A chunk whose request fails counts all of its documents as failed;
+        the other chunks still complete. Returns (indexed count, failed bulk items).
+        """
+        def send_chunk(start: int) -> List[Dict]:
+            chunk = documents[start:start + batch_size]
+            try:
+                lines = []
+                for i, doc in enumerate(chunk, start):
+                    lines.append(orjson.dumps({"index": {"_id": doc.get('id', i)}}))
+                    lines.append(orjson.dumps(doc, option=orjson.OPT_SERIALIZE_NUMPY))
+                lines.append(b"")
+                response = self.client.bulk(body=b"\n".join(lines), index=index_name, request_timeout=60)
+                return response['items']
+            except Exception as e:
+                # Same shape as a bulk item error, one per document in the chunk
+                return [
+                    {"index": {"_id": doc.get('id', i), "error": {"type": type(e).__name__, "reason": str(e)}}}
+                    for i, doc in enumerate(chunk, start)
+                ]
+
+        success, failed = 0, []
+        with ThreadPoolExecutor(max_workers=thread_count, thread_name_prefix="bulk") as pool:
+            for items in pool.map(send_chunk, range(0, len(documents), batch_size)):
+                for item in items:
+                    if 'error' in item['index']:
+                        failed.append(item)
+                    else:
+                        success += 1
+        
+        if failed:
+            # Every failed id, plus the reason for the first few
+            failed_ids = [item['index'].get('_id') for item in failed]
+            self.logger.error(f"❌ {len(failed)} documents failed to index: {failed_ids}")
+            for item in failed[:10]:
+                error = item['index']['error']
+                reason = error.get('reason', error) if isinstance(error, dict) else error
+                self.logger.error(f"❌ Document {item['index'].get('_id')}: {reason}")
+        return success, failed
+
+    def _suspend_refresh(self, index_name: str) -> Optional[str]:
+        """Disable index refresh for a bulk load; returns the setting to restore"""
+        settings = self.client.indices.get_settings(index=index_name, name="index.refresh_interval")
+        previous = settings.get(index_name, {}).get('settings', {}).get('index', {}).get('refresh_interval')
+        self.client.indices.put_settings(index=index_name, body={"index": {"refresh_interval": "-1"}})
+        return previous
+
+    def _restore_refresh(self, index_name: str, previous: Optional[str]):
+        """Put back the refresh interval saved by _suspend_refresh (None resets to the default)"""
+        try:
+            self.client.indices.put_settings(index=index_name, body={"index": {"refresh_interval": previous}})
+        except Exception as e:
+            self.logger.error(f"❌ Failed to restore refresh_interval on {index_name}: {e}")
 
     def vector_search_with_filters(self, index_name: str, query_text: str, 
                                   filters: Optional[Dict] = None, size: int = 500, 
                                   ef_search: Optional[int] = None) -> List[Dict]:
         """Perform filtered HNSW vector search"""
-        if not self.ensure_connection():
-            return []
-            
         try:
-            query_vector = self.model.encode(query_text).tolist()
+            query_vector = self._embed_query(query_text)
             
             knn_query = {
                 "vector": query_vector,
@@ -441,28 +797,22 @@ class BaseSearchEngine:
             if ef_search:
                 knn_query["method_parameters"] = {"ef": ef_search}
             
-            # Add filters if provided
-            query_body = {
-                "size": size,
-                "query": {
-                    "knn": {
-                        "passage_embedding": knn_query
-                    }
-                },
-                "_source": ["passage_text", "metadata"]
-            }
+            knn_clause = {"knn": {"passage_embedding": knn_query}}
             
+            # Add filters if provided
             if filters:
-                query_body["query"] = {
+                query = {
                     "bool": {
-                        "must": [
-                            {"knn": {"passage_embedding": knn_query}}
-                        ],
+                        "must": [knn_clause],
                         "filter": self._build_filter_query(filters)
                     }
                 }
+            else:
+                query = knn_clause
             
-            response = self.client.search(index=index_name, body=query_body)
+            query_body = {**self._BODY_TMPL, "size": size, "query": query}
+            
+            response = self._search(index_name, query_body)
             return response['hits']['hits']
             
         except Exception as e:
@@ -474,13 +824,10 @@ class BaseSearchEngine:
         filter_queries = []
         
         for field, value in filters.items():
-            if isinstance(value, list):
-                filter_queries.append({"terms": {field: value}})
-            elif isinstance(value, dict):
-                if 'range' in value:
-                    filter_queries.append({"range": {field: value['range']}})
-            else:
-                filter_queries.append({"term": {field: value}})
+            # One dict lookup on the exact value type; scalars fall through to 'term'
+            clause = _FILTER_BUILDERS.get(type(value), _term_filter)(field, value)
+            if clause is not None:
+                filter_queries.append(clause)
         
         return filter_queries
 
@@ -493,25 +840,24 @@ class BaseSearchEngine:
             
         best_params = {"ef_search": 100, "recall": 0.0, "latency": float('inf')}
         
+        # Ground truth does not depend on ef_search, so build the sets once
+        truth_sets = [set(ground_truth[i]) if i < len(ground_truth) else set()
+                      for i in range(len(sample_queries))]
+        recalls = np.empty(len(sample_queries))
+        latencies = np.empty(len(sample_queries))
+        
         for ef_search in ef_search_values:
-            total_recall = 0.0
-            total_latency = 0.0
-            
             for i, query in enumerate(sample_queries):
-                start_time = time.time()
+                start_time = time.perf_counter()
                 results = self.vector_search(index_name, query, size=10, ef_search=ef_search)
-                latency = time.time() - start_time
+                latencies[i] = time.perf_counter() - start_time
                 
                 # Calculate recall
-                retrieved_ids = [hit['_id'] for hit in results]
-                true_ids = ground_truth[i] if i < len(ground_truth) else []
-                recall = len(set(retrieved_ids) & set(true_ids)) / max(len(true_ids), 1)
-                
-                total_recall += recall
-                total_latency += latency
+                true_ids = truth_sets[i]
+                recalls[i] = len({hit['_id'] for hit in results} & true_ids) / max(len(true_ids), 1)
             
-            avg_recall = total_recall / len(sample_queries)
-            avg_latency = total_latency / len(sample_queries)
+            avg_recall = float(np.mean(recalls))
+            avg_latency = float(np.mean(latencies))
             
             self.logger.info(f"ef_search={ef_search}: recall={avg_recall:.3f}, latency={avg_latency:.3f}ms")
             
@@ -528,11 +874,8 @@ class BaseSearchEngine:
 
     def get_index_stats(self, index_name: str) -> Dict:
         """Get HNSW index statistics"""
-        if not self.ensure_connection():
-            return {}
-            
         try:
-            stats = self.client.indices.stats(index=index_name)
+            stats = self._with_reconnect(lambda: self.client.indices.stats(index=index_name))
             index_stats = stats['indices'][index_name]
             
             return {
@@ -548,20 +891,27 @@ class BaseSearchEngine:
     def count_tokens(self, text: str) -> int:
         """Count tokens in text"""
         if self.tokenizer:
-            return len(self.tokenizer.encode(text))
+            return len(self.tokenizer.encode_ordinary(text))
         else:
             return len(text) // 4
 
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Count tokens for many texts; tiktoken encodes the batch across threads"""
+        if self.tokenizer:
+            return [len(tokens) for tokens in self.tokenizer.encode_ordinary_batch(texts, num_threads=os.cpu_count() or 1)]
+        else:
+            return [len(text) // 4 for text in texts]
+
     def rate_limit_gemini(self):
         """Apply rate limiting for Gemini"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < self.config.min_request_interval:
-            sleep_time = self.config.min_request_interval - time_since_last
-            time.sleep(sleep_time)
+        # Reserve the next slot under the lock, then sleep outside it
+        with self._rate_limit_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_allowed_ts)
+            self._next_allowed_ts = slot + self.config.min_request_interval
         
-        self.last_request_time = time.time()
+        if slot > now:
+            time.sleep(slot - now)
 
     def estimate_cost(self, input_tokens: int, output_tokens: int = 0) -> float:
         """Estimate cost for Gemini"""
@@ -1,15 +1,20 @@
 import requests
 import json
+from requests.adapters import HTTPAdapter
 
 BASE_URL = "http://localhost:8000"
 
+# One keep-alive session for all test requests
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=10))
+
 def test_malformed_requests():
     """Test requests that should trigger 422 errors"""
     print("🔍 Testing malformed requests that should trigger 422...")
     
     # Test 1: Invalid JSON
     try:
-        response1 = requests.post(f"{BASE_URL}/search", data="invalid json", headers={"Content-Type": "application/json"})
+        response1 = session.post(f"{BASE_URL}/search", data="invalid json", headers={"Content-Type": "application/json"})
         print(f"Invalid JSON - Status: {response1.status_code}")
         if response1.status_code == 422:
             print(f"Error: {response1.json()}")
@@ -18,7 +23,7 @@ def test_malformed_requests():
     
     # Test 2: Missing Content-Type
     payload2 = {"query": "test", "index_name": "test"}
-    response2 = requests.post(f"{BASE_URL}/search", data=json.dumps(payload2))
+    response2 = session.post(f"{BASE_URL}/search", data=json.dumps(payload2))
     print(f"Missing Content-Type - Status: {response2.status_code}")
     if response2.status_code == 422:
         print(f"Error: {response2.json()}")
@@ -29,7 +34,7 @@ def test_malformed_requests():
         "index_name": "test",
         "num_results": "not_a_number"
     }
-    response3 = requests.post(f"{BASE_URL}/search", json=payload3)
+    response3 = session.post(f"{BASE_URL}/search", json=payload3)
     print(f"Wrong data type - Status: {response3.status_code}")
     if response3.status_code == 422:
         print(f"Error: {response3.json()}")
@@ -43,7 +48,7 @@ def test_authenticated_malformed():
         "username": "testuser2",
         "password": "testpassword123"
     }
-    login_response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    login_response = session.post(f"{BASE_URL}/auth/login", json=login_data)
     
     if login_response.status_code == 200:
         token = login_response.json()["access_token"]
@@ -54,7 +59,7 @@ def test_authenticated_malformed():
             "query": "test"
             # Missing index_name
         }
-        response = requests.post(f"{BASE_URL}/search", json=payload, headers=headers)
+        response = session.post(f"{BASE_URL}/search", json=payload, headers=headers)
         print(f"Missing index_name (authenticated) - Status: {response.status_code}")
         if response.status_code == 422:
             print(f"Error: {response.json()}")
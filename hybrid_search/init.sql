@@ -22,8 +22,9 @@ CREATE TABLE IF NOT EXISTS user_sessions (
 -- Create indexes
 CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
-CREATE INDEX IF NOT EXISTS idx_sessions_token ON user_sessions(session_token);
-CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON user_sessions(user_id);
+-- session_token lookups use the index behind its UNIQUE constraint
+-- (user_id, expires_at) also serves user_id-only lookups and FK cascades
+CREATE INDEX IF NOT EXISTS idx_sessions_user_expires ON user_sessions(user_id, expires_at);
 
 -- Insert a default admin user (password: admin123)
 INSERT INTO users (username, email, hashed_password, is_superuser) 
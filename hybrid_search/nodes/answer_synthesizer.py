@@ -1,8 +1,152 @@
 import time
 import os
-from typing import Dict, Any, Optional
+import re
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional
+import numpy as np
 from core.base_search import BaseSearchEngine
-import google.generativeai as genai
+from utils.gemini import get_genai
+
+# Static instruction blocks; they lead each prompt so the prefix is identical across requests
+SYNTHESIS_PREAMBLE = """You are an advanced AI research assistant with expert analytical capabilities.
+
+INSTRUCTIONS:
+- Synthesize a comprehensive, well-structured answer using the reasoning and context
+- Reference specific sources using [Source X] format when citing information
+- Organize complex information with clear sections or bullet points when appropriate
+- Be precise and factual while maintaining readability
+- If the context has limitations, acknowledge them transparently
+- Integrate the analytical insights naturally into your response
+- Aim for depth and accuracy over brevity"""
+
+REASONING_PREAMBLE = """You are an expert research analyst. Analyze the information that follows and provide structured reasoning for answering the research question.
+
+Please provide analytical reasoning that includes:
+1. Key themes and patterns identified
+2. Relevance assessment of available information
+3. Information gaps or limitations
+4. Synthesis approach for comprehensive answer"""
+
+# Fixed pieces of the per-request prompt tails
+_PREAMBLE_SEP = "\n\n"
+_CONTEXT_HEAD = "SEARCH CONTEXT:\n"
+_REASONING_HEAD = "\n\nANALYTICAL REASONING:\n"
+_ANALYSIS_HEAD = "\n\nANALYSIS DATA: "
+_QUESTION_HEAD = "\n\nRESEARCH QUESTION: "
+_ANSWER_TAIL = "\n\nCOMPREHENSIVE RESEARCH ANSWER:"
+_REASONING_TAIL = "\n\nANALYTICAL REASONING:"
+
+# Estimated token budget for the context in the reasoning prompt
+REASONING_CONTEXT_TOKENS = 4000
+
+# Marks the start of each source in a formatted context
+_SOURCE_TAG = '[Source'
+
+# Runs of text between periods, for fallback sentence extraction
+_SENTENCE_RE = re.compile(r'[^.]+')
+
+def _iter_blocks(text: str):
+    """Yield the blank-line separated blocks of text without splitting all of it up front"""
+    start = 0
+    while True:
+        end = text.find('\n\n', start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 2
+
+def _assemble_sources(parts, total: int, max_tokens: Optional[int] = None) -> str:
+    """Join formatted sources, stopping once the estimated token budget is spent
+    
+    The first source is always kept; an over-long one is left to word truncation.
+    """
+    kept = []
+    budget = max_tokens
+    for part in parts:
+        if budget is not None:
+            budget -= int(len(part.split()) * 1.3)
+            if budget < 0 and kept:
+                break
+        kept.append(part)
+    result = '\n\n'.join(kept)
+    if len(kept) < total:
+        result += f"\n\n[Context truncated - showing {len(kept)} of {total} sources]"
+    return result
+
+# Characters per token used for local token estimates
+GEMINI_CHARS_PER_TOKEN = 3.8
+
+# Token/cost fields of an answer that made no Gemini call
+_ZERO_USAGE = MappingProxyType({
+    'input_tokens': 0,
+    'output_tokens': 0,
+    'total_tokens': 0,
+    'cost_estimate': 0.0
+})
+
+# Read-only, shared by every empty-context answer; downstream nodes only read answer_data
+_EMPTY_ANSWER = MappingProxyType({
+    'answer': "I couldn't find any relevant information to answer your question.",
+    **_ZERO_USAGE
+})
+
+# Semantic response cache: answers reused for near-identical queries over the same sources
+RESPONSE_CACHE_SIZE = 4096          # source sets kept
+RESPONSE_CACHE_TTL = 3600           # seconds
+RESPONSE_CACHE_THRESHOLD = 0.95     # min cosine similarity between query embeddings
+RESPONSE_CACHE_PER_KEY = 16         # most recent answers kept per source set
+
+class SemanticResponseCache:
+    """LRU/TTL cache of synthesized answers keyed by retrieved-source set and query embedding"""
+    
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 threshold: float = RESPONSE_CACHE_THRESHOLD, per_key: int = RESPONSE_CACHE_PER_KEY):
+        self.max_size = max_size
+        self.per_key = per_key
+        self.ttl = ttl
+        self.threshold = threshold
+        # sources key -> list of (normalized query embedding, answer_data, expires_at)
+        self._entries: "OrderedDict[str, List[tuple]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def sources_key(search_results: List[Dict[str, Any]]) -> str:
+        ids = sorted(str(result.get('_id', '')) for result in search_results)
+        return hashlib.sha1('|'.join(ids).encode()).hexdigest()
+    
+    def get(self, sources_key: str, embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries.get(sources_key)
+            if not entries:
+                return None
+            entries[:] = [entry for entry in entries if entry[2] > now]
+            if not entries:
+                del self._entries[sources_key]
+                return None
+            self._entries.move_to_end(sources_key)
+            # Embeddings are unit length, so the dot product is the cosine similarity
+            similarities = np.stack([entry[0] for entry in entries]) @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                return entries[best][1]
+            return None
+    
+    def put(self, sources_key: str, embedding: np.ndarray, answer_data: Dict[str, Any]):
+        now = time.monotonic()
+        with self._lock:
+            entries = [entry for entry in self._entries.get(sources_key, ()) if entry[2] > now]
+            entries.append((embedding, answer_data, now + self.ttl))
+            # Only the newest per_key answers, so get's np.stack stays small
+            self._entries[sources_key] = entries[-self.per_key:]
+            self._entries.move_to_end(sources_key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
 
 class AnswerSynthesizer:
     """Enhanced answer synthesis with direct Gemini integration"""
@@ -12,10 +156,25 @@ class AnswerSynthesizer:
         self.config = config
         self.gemini_model = None
         self.answer_generator = None
+        self.response_cache = SemanticResponseCache()
+        # Token counts are only used for logging and cost estimates, so estimate
+        # locally unless exact counts (one count_tokens RPC per text) are wanted
+        self.exact_token_counting = False
         
         # Initialize Gemini directly (replacing DSPy integration)
         self._initialize_gemini()
         
+        # Generation settings are fixed, so build the config once (SDK is loaded by now)
+        self._answer_gen_cfg = None
+        if self.gemini_model:
+            self._answer_gen_cfg = get_genai().types.GenerationConfig(
+                temperature=0.7,
+                max_output_tokens=1024,
+                top_p=0.8,
+                top_k=40,
+                candidate_count=1,
+            )
+        
         # Initialize our own reasoning system (replacing DSPy reasoning)
         self.answer_generator = AdvancedAnswerGenerator(self.gemini_model)
         
@@ -34,7 +193,8 @@ class AnswerSynthesizer:
                 self.gemini_model = None
                 return
             
-            # Configure and create model
+            # Configure and create model (first use of the SDK imports it)
+            genai = get_genai()
             genai.configure(api_key=api_key)
             self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
             
@@ -67,17 +227,35 @@ class AnswerSynthesizer:
             return state
         
         try:
+            # Near-identical query over the same sources: reuse the earlier answer.
+            # Retries skip the lookup, since they exist to get a different answer.
+            cache_key, query_embedding = self._response_cache_key(state)
+            if query_embedding is not None and not state.get("retry_count"):
+                cached_answer = self.response_cache.get(cache_key, query_embedding)
+                if cached_answer is not None:
+                    state["answer_data"] = {**cached_answer, **_ZERO_USAGE}
+                    state["messages"].append("♻️ Answer Synthesizer: Reused cached answer")
+                    state["step_times"] = state.get("step_times", {})
+                    state["step_times"]["answer_synthesis"] = time.time() - step_start
+                    return state
+            
+            # Stringify the context once; reasoning and synthesis both use it
+            context_str = self._prepare_context_string(state["processed_context"])
+            
             # Generate reasoning using our enhanced system (replacing DSPy)
-            reasoning = self._generate_reasoning(state)
+            reasoning = self._generate_reasoning(state, context_str)
             
             # Generate final answer with Gemini (keeping original approach)
             final_answer = self._generate_with_gemini(
                 reasoning,
                 state["processed_context"],
-                state["query"]
+                state["query"],
+                context_str=context_str
             )
             
             state["answer_data"] = final_answer
+            if query_embedding is not None and final_answer.get('from_gemini'):
+                self.response_cache.put(cache_key, query_embedding, final_answer)
             state["messages"].append(
                 f"✅ Answer Synthesizer: Generated answer ({final_answer['output_tokens']} tokens)"
             )
@@ -91,8 +269,20 @@ class AnswerSynthesizer:
         state["step_times"]["answer_synthesis"] = time.time() - step_start
         return state
     
-    def _generate_reasoning(self, state: Dict[str, Any]) -> str:
+    def _response_cache_key(self, state: Dict[str, Any]):
+        """(sources key, normalized query embedding); embedding is None when unavailable"""
+        if not state.get("search_results") or not hasattr(self.search_engine, '_embed_query'):
+            return None, None
+        try:
+            embedding = self.search_engine._embed_query(state["query"])
+        except Exception:
+            return None, None
+        return SemanticResponseCache.sources_key(state["search_results"]), embedding
+    
+    def _generate_reasoning(self, state: Dict[str, Any], context_str: str) -> str:
         """Enhanced reasoning generation (replacing DSPy reasoning)"""
+        # Trim to the reasoning budget here, off the synthesis critical path
+        reasoning_context = self._prepare_context_string(context_str, max_tokens=REASONING_CONTEXT_TOKENS)
         
         # Try our enhanced reasoning if Gemini is available
         if self.answer_generator and self.gemini_model:
@@ -100,7 +290,7 @@ class AnswerSynthesizer:
                 state["messages"].append("🔮 Using enhanced reasoning with Gemini...")
                 reasoning = self.answer_generator.generate_reasoning(
                     query=state["query"],
-                    context=state["processed_context"],
+                    context=reasoning_context,
                     content_analysis=state.get("content_analysis", {}),
                     similarity_analysis=state.get("similarity_analysis", {})
                 )
@@ -115,65 +305,73 @@ class AnswerSynthesizer:
         state["messages"].append("🔧 Using fallback reasoning method")
         return self._generate_fallback_reasoning(
             state["query"],
-            state["processed_context"],
+            context_str,
             state.get("content_analysis", {}),
             state.get("similarity_analysis", {})
         )
 
-    def _generate_with_gemini(self, reasoning: str, context, query: str) -> Dict[str, Any]:
+    def _generate_with_gemini(self, reasoning: str, context, query: str,
+                              context_str: Optional[str] = None) -> Dict[str, Any]:
         """Generate final answer with Gemini (keeping original structure, enhancing implementation)"""
         
         try:
             # Handle context conversion to string
-            context_str = self._prepare_context_string(context)
+            if context_str is None:
+                context_str = self._prepare_context_string(context)
             
-            # Build enhanced prompt (improved version)
-            enhanced_prompt = self._build_enhanced_prompt(reasoning, context_str, query)
+            # Build enhanced prompt (improved version); the preamble-prefixed copy of the
+            # whole context is only built when it is actually sent or counted
+            request_prompt = self._build_request_prompt(reasoning, context_str, query)
             
             # Rate limiting (keeping original approach)
             if hasattr(self.search_engine, 'rate_limit_gemini'):
                 self.search_engine.rate_limit_gemini()
             
-            # Token counting (enhanced with fallback)
-            input_tokens = self._count_tokens_safe(enhanced_prompt)
-            
             # Generate content with Gemini (enhanced error handling)
+            from_gemini = False
+            usage = None
             try:
                 response = self.gemini_model.generate_content(
-                    enhanced_prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.7,
-                        max_output_tokens=1024,
-                        top_p=0.8,
-                        top_k=40,
-                        candidate_count=1,
-                    )
+                    _PREAMBLE_SEP.join((SYNTHESIS_PREAMBLE, request_prompt)),
+                    generation_config=self._answer_gen_cfg
                 )
                 
                 answer_text = self._extract_response_text(response)
+                from_gemini = True
+                usage = getattr(response, 'usage_metadata', None)
                     
             except Exception as api_error:
                 print(f"Gemini API error: {api_error}")
                 # Fallback answer generation (keeping original approach)
                 answer_text = self._generate_fallback_answer(reasoning, context_str, query)
             
-            # Token counting for output
-            output_tokens = self._count_tokens_safe(answer_text)
+            # Token counts: Gemini reports both in the response; count only when it did not
+            if usage is not None and getattr(usage, 'prompt_token_count', None):
+                input_tokens = usage.prompt_token_count
+                output_tokens = usage.candidates_token_count or 0
+            else:
+                input_tokens = self._count_tokens_safe(_PREAMBLE_SEP.join((SYNTHESIS_PREAMBLE, request_prompt)))
+                output_tokens = self._count_tokens_safe(answer_text)
             
             return {
                 'answer': answer_text,
                 'input_tokens': int(input_tokens),
                 'output_tokens': int(output_tokens),
                 'total_tokens': int(input_tokens + output_tokens),
-                'cost_estimate': self._estimate_cost(int(input_tokens), int(output_tokens))
+                'cost_estimate': self._estimate_cost(int(input_tokens), int(output_tokens)),
+                'from_gemini': from_gemini
             }
             
         except Exception as e:
             print(f"Error in _generate_with_gemini: {e}")
             return self._error_answer(e)
     
-    def _prepare_context_string(self, context) -> str:
-        """Enhanced context preparation (improved from original)"""
+    def _prepare_context_string(self, context, max_tokens: Optional[int] = None) -> str:
+        """Enhanced context preparation (improved from original)
+        
+        With max_tokens, sources are added only while the estimated budget
+        lasts, so an over-long context is never assembled in full.
+        """
         if isinstance(context, dict):
             if 'content' in context:
                 return str(context['content'])
@@ -183,57 +381,62 @@ class AnswerSynthesizer:
                 # Enhanced: Handle multiple search results with source attribution
                 results = context['results']
                 if isinstance(results, list):
-                    context_parts = []
-                    for i, result in enumerate(results[:10], 1):  # Limit to top 10
-                        if isinstance(result, dict):
-                            title = result.get('title', f'Source {i}')
-                            content = result.get('content', result.get('snippet', ''))
-                            url = result.get('url', '')
-                            source_info = f"[Source {i}] {title}"
-                            if url:
-                                source_info += f" ({url})"
-                            context_parts.append(f"{source_info}: {content}")
-                        else:
-                            context_parts.append(f"[Source {i}] {str(result)}")
-                    return '\n\n'.join(context_parts)
+                    results = results[:10]  # Limit to top 10
+                    return _assemble_sources(
+                        (self._format_result(i, result) for i, result in enumerate(results, 1)),
+                        len(results),
+                        max_tokens
+                    )
             else:
                 return str(context)
         elif isinstance(context, list):
             # Enhanced: Better list handling
-            context_parts = []
-            for i, item in enumerate(context[:10], 1):
-                if isinstance(item, dict):
-                    title = item.get('title', f'Item {i}')
-                    content = item.get('content', item.get('snippet', str(item)))
-                    context_parts.append(f"[Source {i}] {title}: {content}")
-                else:
-                    context_parts.append(f"[Source {i}] {str(item)}")
-            return '\n\n'.join(context_parts)
+            items = context[:10]
+            return _assemble_sources(
+                (self._format_item(i, item) for i, item in enumerate(items, 1)),
+                len(items),
+                max_tokens
+            )
+        elif isinstance(context, str):
+            if max_tokens is None or _SOURCE_TAG not in context:
+                return context
+            # Already formatted: keep whole sources while the budget lasts
+            return _assemble_sources(_iter_blocks(context), context.count('\n\n') + 1, max_tokens)
         else:
             return str(context)
     
-    def _build_enhanced_prompt(self, reasoning: str, context_str: str, query: str) -> str:
-        """Enhanced prompt building (improved from original)"""
-        return f"""You are an advanced AI research assistant with expert analytical capabilities.
-
-ANALYTICAL REASONING:
-{reasoning}
-
-SEARCH CONTEXT:
-{context_str}
-
-RESEARCH QUESTION: {query}
-
-INSTRUCTIONS:
-- Synthesize a comprehensive, well-structured answer using the reasoning and context
-- Reference specific sources using [Source X] format when citing information
-- Organize complex information with clear sections or bullet points when appropriate
-- Be precise and factual while maintaining readability
-- If the context has limitations, acknowledge them transparently
-- Integrate the analytical insights naturally into your response
-- Aim for depth and accuracy over brevity
-
-COMPREHENSIVE RESEARCH ANSWER:"""
+    @staticmethod
+    def _format_result(i: int, result) -> str:
+        if isinstance(result, dict):
+            title = result.get('title', f'Source {i}')
+            content = result.get('content', result.get('snippet', ''))
+            url = result.get('url', '')
+            source_info = f"[Source {i}] {title}"
+            if url:
+                source_info += f" ({url})"
+            return f"{source_info}: {content}"
+        return f"[Source {i}] {str(result)}"
+    
+    @staticmethod
+    def _format_item(i: int, item) -> str:
+        if isinstance(item, dict):
+            title = item.get('title', f'Item {i}')
+            content = item.get('content', item.get('snippet', str(item)))
+            return f"[Source {i}] {title}: {content}"
+        return f"[Source {i}] {str(item)}"
+    
+    def _build_request_prompt(self, reasoning: str, context_str: str, query: str) -> str:
+        """Per-request part of the synthesis prompt (follows SYNTHESIS_PREAMBLE)
+        
+        Retrieved passages come before the query-specific reasoning and question,
+        so requests over the same sources share the longest possible prompt prefix.
+        """
+        return "".join((
+            _CONTEXT_HEAD, context_str,
+            _REASONING_HEAD, reasoning,
+            _QUESTION_HEAD, query,
+            _ANSWER_TAIL,
+        ))
     
     def _extract_response_text(self, response) -> str:
         """Enhanced response extraction (improved error handling)"""
@@ -257,19 +460,16 @@ COMPREHENSIVE RESEARCH ANSWER:"""
             raise Exception(f"Failed to extract response text: {str(e)}")
     
     def _count_tokens_safe(self, text: str) -> int:
-        """Enhanced token counting (improved from original)"""
-        try:
-            # Try using Gemini's native token counting
-            if hasattr(self.gemini_model, 'count_tokens'):
+        """Estimate tokens locally; the count_tokens RPC only runs with exact_token_counting"""
+        if self.exact_token_counting and self.gemini_model is not None:
+            try:
                 result = self.gemini_model.count_tokens(text)
                 return result.total_tokens if hasattr(result, 'total_tokens') else result
-        except Exception:
-            pass
+            except Exception:
+                pass
         
-        # Enhanced fallback estimation
-        word_count = len(text.split())
-        # More accurate token estimation for Gemini
-        return int(word_count * 1.3)
+        # Gemini averages about 3.8 characters per token on English text
+        return max(1, int(len(text) / GEMINI_CHARS_PER_TOKEN)) if text else 0
 
     def _generate_fallback_answer(self, reasoning: str, context: str, query: str) -> str:
         """Enhanced fallback answer generation (keeping original structure)"""
@@ -285,11 +485,11 @@ COMPREHENSIVE RESEARCH ANSWER:"""
         
         # Enhanced context extraction
         if context and len(context) > 100:
-            # Try to extract key sentences more intelligently
-            sentences = [s.strip() for s in context.split('.') if s.strip() and len(s.strip()) > 20]
+            # Take the first 3 substantial sentences, scanning only as far as needed
+            sentences = (m.group().strip() for m in _SENTENCE_RE.finditer(context))
+            sentences = list(itertools.islice((s for s in sentences if len(s) > 20), 3))
             if sentences:
-                # Take first 3 substantial sentences
-                key_info = '. '.join(sentences[:3])
+                key_info = '. '.join(sentences)
                 if not key_info.endswith('.'):
                     key_info += '.'
                 answer_parts.append(f"\nKey Findings: {key_info}")
@@ -331,7 +531,7 @@ COMPREHENSIVE RESEARCH ANSWER:"""
         # Enhanced context analysis
         if isinstance(context, str):
             context_words = len(context.split())
-            source_count = context.count('[Source') if '[Source' in context else 1
+            source_count = context.count(_SOURCE_TAG) or 1
             reasoning_parts.append(f"Synthesizing {context_words} words from {source_count} sources")
         
         reasoning_parts.append("Applying comprehensive analytical framework for optimal response synthesis")
@@ -339,23 +539,12 @@ COMPREHENSIVE RESEARCH ANSWER:"""
         return " | ".join(reasoning_parts)
     
     # Keep all the utility methods from original with same signatures
-    def _empty_answer(self) -> Dict[str, Any]:
-        return {
-            'answer': "I couldn't find any relevant information to answer your question.",
-            'input_tokens': 0,
-            'output_tokens': 0,
-            'total_tokens': 0,
-            'cost_estimate': 0.0
-        }
+    def _empty_answer(self) -> Mapping[str, Any]:
+        """Shared read-only answer; copy with dict() before mutating"""
+        return _EMPTY_ANSWER
     
     def _error_answer(self, error: Exception) -> Dict[str, Any]:
-        return {
-            'answer': f"Error generating answer: {str(error)}",
-            'input_tokens': 0,
-            'output_tokens': 0,
-            'total_tokens': 0,
-            'cost_estimate': 0.0
-        }
+        return {'answer': f"Error generating answer: {str(error)}", **_ZERO_USAGE}
     
     def _estimate_cost(self, input_tokens: int, output_tokens: int) -> float:
         """Estimate cost for Gemini (keeping original logic)"""
@@ -371,6 +560,14 @@ class AdvancedAnswerGenerator:
     
     def __init__(self, gemini_model):
         self.gemini_model = gemini_model
+        self._reason_gen_cfg = None
+        if gemini_model:
+            self._reason_gen_cfg = get_genai().types.GenerationConfig(
+                temperature=0.3,  # Lower temperature for more analytical reasoning
+                max_output_tokens=512,
+                top_p=0.9,
+                top_k=40,
+            )
     
     def generate_reasoning(self, query: str, context: str, content_analysis: Dict, similarity_analysis: Dict) -> str:
         """Generate analytical reasoning using Gemini directly"""
@@ -378,36 +575,21 @@ class AdvancedAnswerGenerator:
         # Prepare analysis summary
         analysis_summary = self._prepare_analysis_summary(content_analysis, similarity_analysis)
         
-        # Manage context window intelligently
-        managed_context = self._manage_context_window(context, max_tokens=4000)
+        # Callers trim whole sources to the budget already; this only catches oversized text
+        managed_context = self._manage_context_window(context, max_tokens=REASONING_CONTEXT_TOKENS)
         
-        # Build reasoning prompt
-        reasoning_prompt = f"""You are an expert research analyst. Analyze the following information and provide structured reasoning for answering the research question.
-
-RESEARCH QUESTION: {query}
-
-SEARCH CONTEXT:
-{managed_context}
-
-ANALYSIS DATA: {analysis_summary}
-
-Please provide analytical reasoning that includes:
-1. Key themes and patterns identified
-2. Relevance assessment of available information
-3. Information gaps or limitations
-4. Synthesis approach for comprehensive answer
-
-ANALYTICAL REASONING:"""
+        # Build reasoning prompt: static preamble first, request data last
+        request_prompt = "".join((
+            _CONTEXT_HEAD, managed_context,
+            _ANALYSIS_HEAD, analysis_summary,
+            _QUESTION_HEAD, query,
+            _REASONING_TAIL,
+        ))
         
         try:
             response = self.gemini_model.generate_content(
-                reasoning_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.3,  # Lower temperature for more analytical reasoning
-                    max_output_tokens=512,
-                    top_p=0.9,
-                    top_k=40,
-                )
+                _PREAMBLE_SEP.join((REASONING_PREAMBLE, request_prompt)),
+                generation_config=self._reason_gen_cfg
             )
             
             if hasattr(response, 'text') and response.text:
@@ -420,41 +602,21 @@ ANALYTICAL REASONING:"""
             # Enhanced fallback reasoning
             return self._generate_enhanced_fallback_reasoning(query, managed_context, analysis_summary)
     
-    def _manage_context_window(self, context: str, max_tokens: int = 4000) -> str:
-        """Intelligent context window management"""
+    def _manage_context_window(self, context: str, max_tokens: int = REASONING_CONTEXT_TOKENS) -> str:
+        """Word-based context window management
         
-        # Rough token estimation
-        estimated_tokens = len(context.split()) * 1.3
+        Source-aware truncation happens in AnswerSynthesizer._prepare_context_string.
+        """
+        words = context.split()
         
-        if estimated_tokens <= max_tokens:
+        # Rough token estimation
+        if len(words) * 1.3 <= max_tokens:
             return context
         
-        # Smart truncation by sources
-        if '[Source' in context:
-            sources = context.split('\n\n')
-            result_parts = []
-            current_tokens = 0
-            
-            for part in sources:
-                part_tokens = len(part.split()) * 1.3
-                if current_tokens + part_tokens > max_tokens:
-                    break
-                result_parts.append(part)
-                current_tokens += part_tokens
-            
-            result = '\n\n'.join(result_parts)
-            if len(result_parts) < len(sources):
-                result += f"\n\n[Context truncated - showing {len(result_parts)} of {len(sources)} sources]"
-            return result
-        
         # Simple word-based truncation
-        words = context.split()
         max_words = int(max_tokens * 0.75)
-        if len(words) > max_words:
-            truncated = ' '.join(words[:max_words])
-            return truncated + '\n\n[Content truncated for length management]'
-        
-        return context
+        truncated = ' '.join(words[:max_words])
+        return truncated + '\n\n[Content truncated for length management]'
     
     def _prepare_analysis_summary(self, content_analysis: Dict, similarity_analysis: Dict) -> str:
         """Enhanced analysis summary preparation"""
@@ -492,7 +654,7 @@ ANALYTICAL REASONING:"""
         # Context assessment
         if context:
             word_count = len(context.split())
-            source_count = context.count('[Source') if '[Source' in context else 1
+            source_count = context.count(_SOURCE_TAG) or 1
             reasoning_parts.append(f"Processing {word_count} words from {source_count} sources")
         
         # Analysis integration
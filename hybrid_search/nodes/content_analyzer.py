@@ -1,8 +1,10 @@
 import time
-import numpy as np
+import heapq
+from collections import Counter
+from statistics import fmean, pstdev
 from datetime import datetime
 from typing import Dict, Any, List
-from utils.serialization import convert_numpy_values
+from utils.state import SearchResults
 
 class ContentAnalyzerNode:
     """Content analyzer agent - analyzes content patterns"""
@@ -24,45 +26,50 @@ class ContentAnalyzerNode:
         
         try:
             results = state["search_results"]
-            texts = [result['_source']['passage_text'] for result in results]
-            scores = [result['_score'] for result in results]
+            columns = state.get("result_columns") or SearchResults.from_hits(results)
+            texts = columns.passage_texts
+            scores = columns.scores
             
-            # Content statistics
-            text_lengths = [len(text) for text in texts]
-            word_counts = [len(text.split()) for text in texts]
+            # Content statistics and word frequencies in a single pass per document
+            # (no joined copy of the whole corpus)
+            text_lengths = []
+            word_counts = []
+            word_freq = Counter()
+            for text in texts:
+                words = text.lower().split()
+                text_lengths.append(len(text))
+                word_counts.append(len(words))
+                word_freq.update(words)
             
-            # Topic extraction (simple keyword frequency)
-            all_words = ' '.join(texts).lower().split()
-            word_freq = {}
-            for word in all_words:
-                if len(word) > 3 and word.isalpha():  # Skip short words and numbers
-                    word_freq[word] = word_freq.get(word, 0) + 1
-            
-            top_keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:10]
+            # Filter distinct words only; skip short words and numbers
+            top_keywords = heapq.nlargest(
+                10,
+                ((word, count) for word, count in word_freq.items() if len(word) > 3 and word.isalpha()),
+                key=lambda x: x[1]
+            )
             
             # Content diversity analysis
-            unique_words = set(all_words)
-            total_words = len(all_words)
-            diversity_ratio = len(unique_words) / total_words if total_words > 0 else 0
+            total_words = sum(word_counts)
+            diversity_ratio = len(word_freq) / total_words if total_words > 0 else 0
             
             content_analysis = {
                 'num_documents': len(results),
-                'avg_text_length': float(np.mean(text_lengths)),
-                'avg_word_count': float(np.mean(word_counts)),
+                'avg_text_length': fmean(text_lengths),
+                'avg_word_count': fmean(word_counts),
                 'score_stats': {
                     'min': float(min(scores)),
                     'max': float(max(scores)),
-                    'mean': float(np.mean(scores)),
-                    'std': float(np.std(scores))
+                    'mean': fmean(scores),
+                    'std': pstdev(scores)
                 },
                 'top_keywords': top_keywords,
                 'content_diversity': float(diversity_ratio),
-                'total_unique_words': len(unique_words),
+                'total_unique_words': len(word_freq),
                 'analysis_timestamp': datetime.now().isoformat()
             }
             
-            # Ensure all values are serializable
-            state["content_analysis"] = convert_numpy_values(content_analysis)
+            # Every value above is already a native Python type, so no numpy conversion pass
+            state["content_analysis"] = content_analysis
             
             state["messages"].append(f"📊 Content Analyzer: Analyzed {len(results)} documents")
             state["messages"].append(f"🔑 Top themes: {', '.join([kw[0] for kw in top_keywords[:3]])}")
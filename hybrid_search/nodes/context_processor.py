@@ -1,6 +1,7 @@
 import time
 from typing import Dict, Any, List
 from utils.token_counter import TokenCounter
+from utils.state import SearchResults
 from config.settings import SearchConfig
 
 # Try to import DSPy and LlamaIndex (optional dependencies)
@@ -12,10 +13,8 @@ except ImportError:
     print("⚠️ DSPy not available. Using fallback context processing.")
 
 try:
-    from llama_index.core import Document, VectorStoreIndex
+    from llama_index.core import Document
     from llama_index.core.node_parser import TokenTextSplitter
-    from llama_index.core.response_synthesizers import get_response_synthesizer
-    from llama_index.core.query_engine import RetrieverQueryEngine
     LLAMAINDEX_AVAILABLE = True
 except ImportError:
     LLAMAINDEX_AVAILABLE = False
@@ -34,14 +33,18 @@ class ContextProcessor:
         else:
             self.context_optimizer = None
         
-        # LlamaIndex components if available
-        if LLAMAINDEX_AVAILABLE:
-            self.text_splitter = TokenTextSplitter(
-                chunk_size=config.max_context_tokens // 4,  # Conservative chunking
-                chunk_overlap=config.context_overlap
+        # LlamaIndex splitter, built on first access rather than per instance
+        self._text_splitter = None
+    
+    @property
+    def text_splitter(self):
+        if self._text_splitter is None and LLAMAINDEX_AVAILABLE:
+            self._text_splitter = TokenTextSplitter(
+                chunk_size=self.config.max_context_tokens // 4,  # Conservative chunking
+                chunk_overlap=self.config.context_overlap
             )
-        else:
-            self.text_splitter = None
+        return self._text_splitter
+    
     def process(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Process method for LangGraph compatibility"""
         return self(state)
@@ -61,48 +64,14 @@ class ContextProcessor:
         
         try:
             # Extract documents
-            documents = []
-            for i, result in enumerate(state["search_results"]):
-                doc = Document(
-                    text=result['_source']['passage_text'],
-                    metadata={
-                        'source_id': result['_id'],
-                        'score': result['_score'],
-                        'index': i
-                    }
-                ) if LLAMAINDEX_AVAILABLE else {
-                    'text': result['_source']['passage_text'],
-                    'metadata': {
-                        'source_id': result['_id'],
-                        'score': result['_score'],
-                        'index': i
-                    }
-                }
-                documents.append(doc)
-            
-            # Use DSPy to optimize context selection if available
-            if self.context_optimizer:
-                optimized_context = self.context_optimizer(
-                    query=state["query"],
-                    documents=documents,
-                    max_tokens=self.config.max_context_tokens
-                )
-            else:
-                optimized_context = self._simple_context_selection(
-                    documents, 
-                    self.config.max_context_tokens
-                )
-            
-            # Process with LlamaIndex for better chunking if available
-            if LLAMAINDEX_AVAILABLE:
-                processed_context = self._process_with_llamaindex(
-                    optimized_context, 
-                    state["query"]
-                )
+            columns = state.get("result_columns") or SearchResults.from_hits(state["search_results"])
+            # Tokenize every passage once; selection and assembly reuse the counts
+            token_counts = self.token_counter.count_tokens_batch(columns.passage_texts)
+            if sum(token_counts) <= self.config.max_context_tokens:
+                # Everything fits: there is nothing to select, so skip DSPy/LlamaIndex
+                processed_context = self._assemble_all(columns, token_counts)
             else:
-                processed_context = self._fallback_context_processing(
-                    optimized_context["selected_passages"]
-                )
+                processed_context = self._select_and_process(state["query"], columns, token_counts)
             
             state["processed_context"] = processed_context["context"]
             state["context_metadata"] = processed_context["metadata"]
@@ -113,45 +82,84 @@ class ContextProcessor:
             
         except Exception as e:
             state["error"] = f"Context processing error: {str(e)}"
-            state["processed_context"] = self._fallback_context_processing(state["search_results"])
+            fallback_context = self._fallback_context_processing(state["search_results"])
+            state["processed_context"] = fallback_context["context"]
+            state["context_metadata"] = fallback_context["metadata"]
             state["messages"].append(f"❌ Context Processor: Error - {str(e)}")
         
         state["step_times"]["context_processing"] = time.time() - step_start
         return state
     
-    def _process_with_llamaindex(self, context_data: Dict, query: str) -> Dict[str, Any]:
-        """Use LlamaIndex for sophisticated context processing"""
-        
-        # Create documents from optimized context
+    def _select_and_process(self, query: str, columns: SearchResults, token_counts: List[int]) -> Dict[str, Any]:
+        """Select passages within the token budget, then assemble the context"""
         documents = []
-        for item in context_data["selected_passages"]:
-            doc = Document(
-                text=item["text"],
-                metadata=item["metadata"]
-            )
+        for i, (text, source_id, score, token_count) in enumerate(
+            zip(columns.passage_texts, columns.ids, columns.scores, token_counts)
+        ):
+            metadata = {
+                'source_id': source_id,
+                'score': score,
+                'index': i,
+                'token_count': token_count
+            }
+            doc = Document(text=text, metadata=metadata) if LLAMAINDEX_AVAILABLE else {
+                'text': text,
+                'metadata': metadata
+            }
             documents.append(doc)
         
-        # Create index and query engine
-        index = VectorStoreIndex.from_documents(documents)
+        # Use DSPy to optimize context selection if available
+        if self.context_optimizer:
+            optimized_context = self.context_optimizer(
+                query=query,
+                documents=documents,
+                max_tokens=self.config.max_context_tokens
+            )
+        else:
+            optimized_context = self._simple_context_selection(
+                documents, 
+                self.config.max_context_tokens
+            )
         
-        # Get response synthesizer with context window management
-        response_synthesizer = get_response_synthesizer(
-            response_mode="tree_summarize",  # Good for long contexts
-            use_async=False
-        )
+        # Process with LlamaIndex for better chunking if available
+        if LLAMAINDEX_AVAILABLE:
+            processed_context = self._process_with_llamaindex(
+                optimized_context, 
+                query
+            )
+        else:
+            processed_context = self._fallback_context_processing(
+                optimized_context["selected_passages"]
+            )
+        return processed_context
+    
+    def _assemble_all(self, columns: SearchResults, token_counts: List[int]) -> Dict[str, Any]:
+        """Context of every passage, highest score first (same order and labels as the selection path)"""
+        order = sorted(range(len(token_counts)), key=lambda i: columns.scores[i], reverse=True)
+        return {
+            "context": "\n\n".join(f"[Source {i + 1}] {columns.passage_texts[i]}" for i in order),
+            "metadata": {
+                "total_tokens": sum(token_counts),
+                "num_sources": len(order),
+                "optimization_score": 1.0 if order else 0.0
+            }
+        }
+    
+    def _process_with_llamaindex(self, context_data: Dict, query: str) -> Dict[str, Any]:
+        """Use LlamaIndex for sophisticated context processing
         
-        # Create query engine
-        query_engine = RetrieverQueryEngine(
-            retriever=index.as_retriever(similarity_top_k=5),
-            response_synthesizer=response_synthesizer
-        )
+        Assembles the selected passages directly; no throwaway vector index
+        (and re-embedding of every passage) is built for it.
+        """
         
         # Prepare context for LLM
         context_parts = []
         total_tokens = 0
         
         for item in context_data["selected_passages"]:
-            tokens = self.token_counter.count_tokens(item["text"])
+            tokens = item["metadata"].get("token_count")
+            if tokens is None:
+                tokens = self.token_counter.count_tokens(item["text"])
             if total_tokens + tokens <= self.config.max_context_tokens:
                 context_parts.append(f"[Source {item['metadata']['index'] + 1}] {item['text']}")
                 total_tokens += tokens
@@ -180,15 +188,18 @@ class ContextProcessor:
         for doc in sorted_docs:
             if hasattr(doc, 'text'):
                 doc_text = doc.text
-                doc_tokens = self.token_counter.count_tokens(doc_text)
+                doc_metadata = doc.metadata
             else:
                 doc_text = doc['text']
+                doc_metadata = doc['metadata']
+            doc_tokens = doc_metadata.get('token_count')
+            if doc_tokens is None:
                 doc_tokens = self.token_counter.count_tokens(doc_text)
             
             if total_tokens + doc_tokens <= max_tokens:
                 selected.append({
                     "text": doc_text,
-                    "metadata": doc.metadata if hasattr(doc, 'metadata') else doc['metadata']
+                    "metadata": doc_metadata
                 })
                 total_tokens += doc_tokens
             else:
@@ -204,10 +215,14 @@ class ContextProcessor:
         context_parts = []
         total_tokens = 0
         
-        for i, result in enumerate(search_results[:5]):
-            text = result['_source']['passage_text']
-            tokens = self.token_counter.count_tokens(text)
-            
+        # Raw hits or selected passages; counted in one batch, normally all cache hits
+        texts = [
+            result['_source']['passage_text'] if '_source' in result else result['text']
+            for result in search_results[:5]
+        ]
+        token_counts = self.token_counter.count_tokens_batch(texts)
+        
+        for i, (text, tokens) in enumerate(zip(texts, token_counts)):
             if total_tokens + tokens <= self.config.max_context_tokens:
                 context_parts.append(f"[Source {i + 1}] {text}")
                 total_tokens += tokens
@@ -215,7 +230,7 @@ class ContextProcessor:
                 # Truncate text to fit
                 remaining_tokens = self.config.max_context_tokens - total_tokens
                 if remaining_tokens > 100:  # Only add if meaningful space left
-                    truncated_text = text[:remaining_tokens * 4]  # Rough char estimation
+                    truncated_text = self.token_counter.truncate_to_tokens(text, remaining_tokens)
                     context_parts.append(f"[Source {i + 1}] {truncated_text}...")
                 break
         
@@ -235,54 +250,21 @@ if DSPY_AVAILABLE:
         
         def __init__(self):
             super().__init__()
-            self.context_selector = dspy.Predict("query, documents -> selected_passages, reasoning")
         
         def forward(self, query: str, documents: List, max_tokens: int):
-            """Select and optimize context using DSPy"""
+            """Select and optimize context
             
-            # Prepare documents summary for DSPy
-            doc_summaries = []
-            for i, doc in enumerate(documents):
-                if hasattr(doc, 'text'):
-                    doc_text = doc.text
-                    doc_metadata = doc.metadata
-                else:
-                    doc_text = doc['text']
-                    doc_metadata = doc['metadata']
-                
-                summary = {
-                    "id": i,
-                    "text": doc_text[:200] + "..." if len(doc_text) > 200 else doc_text,
-                    "metadata": doc_metadata,
-                    "length": len(doc_text)
-                }
-                doc_summaries.append(summary)
-            
-            # Use DSPy to select best passages
-            try:
-                result = self.context_selector(
-                    query=query,
-                    documents=str(doc_summaries)
-                )
-                
-                # Parse DSPy result and select passages
-                selected_passages = self._parse_selection_result(result, documents, max_tokens)
-                
-            except Exception as e:
-                # Fallback to simple selection
-                selected_passages = self._simple_selection(documents, max_tokens)
+            Selection is score-based; no LLM predictor is consulted, since its
+            output was never parsed and each call cost a full prompt built
+            from a repr of every passage.
+            """
+            selected_passages = self._smart_selection(documents, max_tokens)
             
             return {
                 "selected_passages": selected_passages,
                 "score": len(selected_passages) / len(documents) if documents else 0
             }
         
-        def _parse_selection_result(self, result, documents: List, max_tokens: int):
-            """Parse DSPy selection result"""
-            # This would implement parsing logic based on DSPy output format
-            # For now, implement a smart selection based on scores and relevance
-            return self._smart_selection(documents, max_tokens)
-        
         def _smart_selection(self, documents: List, max_tokens: int):
             """Smart passage selection based on scores and diversity"""
             selected = []
@@ -312,28 +294,3 @@ if DSPY_AVAILABLE:
                     break
             
             return selected
-        
-        def _simple_selection(self, documents: List, max_tokens: int):
-            """Simple fallback selection"""
-            selected = []
-            total_tokens = 0
-            
-            for doc in documents:
-                if hasattr(doc, 'text'):
-                    doc_text = doc.text
-                    doc_metadata = doc.metadata
-                else:
-                    doc_text = doc['text']
-                    doc_metadata = doc['metadata']
-                
-                doc_tokens = len(doc_text) // 4
-                if total_tokens + doc_tokens <= max_tokens:
-                    selected.append({
-                        "text": doc_text,
-                        "metadata": doc_metadata
-                    })
-                    total_tokens += doc_tokens
-                else:
-                    break
-            
-            return selected 
\ No newline at end of file
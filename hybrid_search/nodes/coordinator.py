@@ -1,7 +1,11 @@
 import time
+import re
 from typing import Dict, Any
 from config.settings import SearchConfig
 
+# C-level scan that stops at the first digit
+_has_digit = re.compile(r'\d').search
+
 class CoordinatorNode:
     """Coordinator agent - orchestrates the workflow"""
     
@@ -24,11 +28,14 @@ class CoordinatorNode:
         
         state["messages"].append("🎯 Coordinator: Analyzing query and planning search strategy...")
         
-        # Analyze query complexity and determine optimal strategy
-        query_length = len(state["query"].split())
+        # Analyze query complexity and determine optimal strategy; the word set is
+        # kept on the state so later nodes don't re-split the query
+        query_tokens = state["query"].split()
+        query_length = len(query_tokens)
+        state["query_word_set"] = frozenset(token.lower() for token in query_tokens)
         
         # Optimize search method based on query characteristics
-        if query_length <= 3 and any(char.isdigit() for char in state["query"]):
+        if query_length <= 3 and _has_digit(state["query"]):
             # Short queries with numbers might benefit from exact matching
             recommended_method = "bm25"
         elif query_length > 10:
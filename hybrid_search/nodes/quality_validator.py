@@ -1,8 +1,10 @@
 import time
-import numpy as np
+import re
 from typing import Dict, Any
 from config.settings import SearchConfig
-from utils.serialization import convert_numpy_values
+
+# "Source N" / "[N]" citations of the first five sources
+_SOURCE_REF_RE = re.compile(r'Source ([1-5])|\[([1-5])\]')
 
 class QualityValidatorNode:
     """Quality validator agent - validates answer quality"""
@@ -50,7 +52,8 @@ class QualityValidatorNode:
                 quality_factors.append(0.9)
             
             # Source reference check
-            source_references = sum(1 for i in range(1, 6) if f"Source {i}" in answer or f"[{i}]" in answer)
+            # One scan of the answer; count distinct source numbers cited
+            source_references = len({m.group(1) or m.group(2) for m in _SOURCE_REF_RE.finditer(answer)})
             if source_references > 0:
                 quality_factors.append(0.9)
             else:
@@ -58,8 +61,11 @@ class QualityValidatorNode:
                 quality_factors.append(0.5)
             
             # Content relevance check
-            query_words = set(state["query"].lower().split())
-            answer_words = set(answer.lower().split())
+            answer_lower = answer.lower()
+            query_words = state.get("query_word_set")
+            if query_words is None:
+                query_words = set(state["query"].lower().split())
+            answer_words = set(answer_lower.split())
             relevance_ratio = len(query_words & answer_words) / len(query_words) if query_words else 0
             
             if relevance_ratio > 0.5:
@@ -71,29 +77,30 @@ class QualityValidatorNode:
                 quality_factors.append(0.4)
             
             # Analysis integration check
-            if state.get("content_analysis") and any(kw[0] in answer.lower() for kw in state["content_analysis"].get("top_keywords", [])[:3]):
+            # Substring match, so keywords inside longer or punctuated words still count
+            if state.get("content_analysis") and any(kw[0] in answer_lower for kw in state["content_analysis"].get("top_keywords", [])[:3]):
                 quality_factors.append(0.8)  # Good integration of analysis
             else:
                 quality_factors.append(0.6)  # Moderate integration
             
             # Calculate overall quality score
-            quality_score = np.mean(quality_factors) if quality_factors else 0.0
+            quality_score = sum(quality_factors) / len(quality_factors) if quality_factors else 0.0
             validation_passed = quality_score > self.config.quality_threshold and len(issues) <= 1
             retry_recommended = quality_score < self.config.retry_threshold
             
             validation_results = {
-                'quality_score': float(quality_score),
+                'quality_score': quality_score,
                 'issues': issues,
-                'validation_passed': bool(validation_passed),
-                'retry_recommended': bool(retry_recommended),
+                'validation_passed': validation_passed,
+                'retry_recommended': retry_recommended,
                 'source_references': source_references,
                 'relevance_ratio': float(relevance_ratio),
-                'quality_factors': [float(factor) for factor in quality_factors]
+                'quality_factors': quality_factors
             }
             
-            # Ensure all values are serializable
-            state["validation_results"] = convert_numpy_values(validation_results)
-            state["quality_score"] = float(quality_score)
+            # Plain Python values throughout, so no numpy conversion pass
+            state["validation_results"] = validation_results
+            state["quality_score"] = quality_score
             
             if validation_passed:
                 state["messages"].append(f"✅ Quality Validator: Answer approved (score: {quality_score:.2f})")
@@ -1,13 +1,73 @@
 import time
+import hashlib
+import threading
 import numpy as np
-from typing import Dict, Any, List
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 from core.base_search import BaseSearchEngine
+from utils.state import SearchResults
+
+# Retrieval results reused for repeated queries
+QUERY_CACHE_SIZE = 2000     # queries kept
+QUERY_CACHE_TTL = 300       # seconds
+
+class QueryCache:
+    """LRU/TTL cache of retrieval results keyed by (index, write generation, method, k, query)"""
+    
+    def __init__(self, max_size: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        # key -> (search_results, result_columns, expires_at)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(index_name: str, generation: int, search_method: str, num_results: int, query: str) -> tuple:
+        digest = hashlib.blake2b(query.encode(), digest_size=16).digest()
+        return (index_name, generation, search_method, num_results, digest)
+    
+    def get(self, key: tuple) -> Optional[Tuple[List[Dict], SearchResults]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+    
+    def put(self, key: tuple, results: List[Dict], columns: SearchResults):
+        with self._lock:
+            self._entries[key] = (results, columns, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
 
 class RetrieverNode:
     """Specialized retrieval node"""
     
     def __init__(self, search_engine: BaseSearchEngine):
         self.search_engine = search_engine
+        self.query_cache = QueryCache()
     
     def process(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Process method for LangGraph compatibility"""
@@ -21,124 +81,194 @@ class RetrieverNode:
         state["messages"].append(f"🔍 Retriever: Executing {state['search_method']} search...")
         
         try:
-            # Perform search based on method
-            if state["search_method"] == "vector":
-                results = self.search_engine.vector_search(
-                    state["index_name"], 
-                    state["query"], 
-                    size=state["num_results"]
-                )
-            elif state["search_method"] == "bm25":
-                results = self.search_engine.bm25_search(
-                    state["index_name"], 
-                    state["query"], 
-                    size=state["num_results"]
-                )
-            else:  # multi_stage/hybrid
-                results = self.multi_stage_search(
-                    state["index_name"], 
-                    state["query"], 
-                    final_size=state["num_results"]
-                )
-            
-            state["search_results"] = results
-            state["messages"].append(f"📄 Retriever: Found {len(results)} relevant documents")
-            
-            if not results:
-                state["error"] = "No search results found"
-                state["messages"].append("❌ Retriever: No results found for query")
+            # Same query against an unchanged index: reuse the earlier results
+            cache_key = self._cache_key(state)
+            if not self._apply_cached(state, cache_key):
+                # Perform search based on method
+                if state["search_method"] == "vector":
+                    results = self.search_engine.vector_search(
+                        state["index_name"], 
+                        state["query"], 
+                        size=state["num_results"]
+                    )
+                elif state["search_method"] == "bm25":
+                    results = self.search_engine.bm25_search(
+                        state["index_name"], 
+                        state["query"], 
+                        size=state["num_results"]
+                    )
+                else:  # multi_stage/hybrid
+                    results = self.multi_stage_search(
+                        state["index_name"], 
+                        state["query"], 
+                        final_size=state["num_results"]
+                    )
+                self._apply_results(state, results, cache_key)
             
         except Exception as e:
-            state["error"] = f"Search error: {str(e)}"
-            state["messages"].append(f"❌ Retriever: Error during search - {str(e)}")
-            state["search_results"] = []
+            self._apply_error(state, e)
         
         state["step_times"]["retrieval"] = time.time() - step_start
         return state
     
+    def batch_process(self, states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Execute retrieval for several states at once
+        
+        Uncached queries are grouped by (index, method, k); each group is
+        embedded in one batch and searched with one _msearch round-trip per
+        sub-search (vector and BM25 run concurrently for multi_stage).
+        """
+        step_start = time.time()
+        
+        groups: Dict[tuple, List[tuple]] = {}
+        for state in states:
+            state["current_step"] = "retrieval"
+            state["messages"].append(f"🔍 Retriever: Executing {state['search_method']} search...")
+            try:
+                cache_key = self._cache_key(state)
+                if not self._apply_cached(state, cache_key):
+                    group = (state["index_name"], state["search_method"], state["num_results"])
+                    groups.setdefault(group, []).append((state, cache_key))
+            except Exception as e:
+                self._apply_error(state, e)
+        
+        for (index_name, search_method, num_results), members in groups.items():
+            queries = [state["query"] for state, _ in members]
+            try:
+                if search_method == "vector":
+                    batch_results = self.search_engine.vector_search_batch(index_name, queries, size=num_results)
+                elif search_method == "bm25":
+                    batch_results = self.search_engine.bm25_search_batch(index_name, queries, size=num_results)
+                else:  # multi_stage/hybrid
+                    batch_results = self.multi_stage_search_batch(index_name, queries, final_size=num_results)
+                for (state, cache_key), results in zip(members, batch_results):
+                    self._apply_results(state, results, cache_key)
+            except Exception as e:
+                for state, _ in members:
+                    self._apply_error(state, e)
+        
+        elapsed = time.time() - step_start
+        for state in states:
+            state["step_times"]["retrieval"] = elapsed
+        return states
+    
+    def _cache_key(self, state: Dict[str, Any]) -> tuple:
+        return QueryCache.make_key(
+            state["index_name"],
+            self.search_engine.index_generation(state["index_name"]),
+            state["search_method"],
+            state["num_results"],
+            state["query"]
+        )
+    
+    def _apply_cached(self, state: Dict[str, Any], cache_key: tuple) -> bool:
+        """Fill state from the query cache; False on a miss"""
+        cached = self.query_cache.get(cache_key)
+        if cached is None:
+            return False
+        results, columns = cached
+        state["search_results"] = list(results)
+        state["result_columns"] = columns
+        state["messages"].append(f"♻️ Retriever: Reused {len(results)} cached results")
+        return True
+    
+    def _apply_results(self, state: Dict[str, Any], results: List[Dict], cache_key: tuple):
+        state["search_results"] = results
+        state["result_columns"] = SearchResults.from_hits(results)
+        state["messages"].append(f"📄 Retriever: Found {len(results)} relevant documents")
+        
+        if not results:
+            state["error"] = "No search results found"
+            state["messages"].append("❌ Retriever: No results found for query")
+        else:
+            self.query_cache.put(cache_key, results, state["result_columns"])
+    
+    @staticmethod
+    def _apply_error(state: Dict[str, Any], error: Exception):
+        state["error"] = f"Search error: {str(error)}"
+        state["messages"].append(f"❌ Retriever: Error during search - {str(error)}")
+        state["search_results"] = []
+        state["result_columns"] = None
+    
     def multi_stage_search(self, index_name: str, query_text: str, final_size: int = 10):
         """Multi-stage hybrid search implementation"""
-        vector_results = self.search_engine.vector_search(index_name, query_text, size=500)
-        bm25_results = self.search_engine.bm25_search(index_name, query_text, size=500)
-        
+        vector_results, bm25_results = self.search_engine.vector_and_bm25(index_name, query_text, size=500)
+        return self._fuse(vector_results, bm25_results, final_size)
+    
+    def multi_stage_search_batch(self, index_name: str, queries: List[str], final_size: int = 10):
+        """multi_stage_search for several queries: one vector and one BM25 _msearch, run concurrently"""
+        vector_batch, bm25_batch = self.search_engine.vector_and_bm25_batch(index_name, queries, size=500)
+        return [
+            self._fuse(vector_results, bm25_results, final_size)
+            for vector_results, bm25_results in zip(vector_batch, bm25_batch)
+        ]
+    
+    def _fuse(self, vector_results: List[Dict], bm25_results: List[Dict], final_size: int) -> List[Dict]:
         if len(vector_results) == 0 and len(bm25_results) == 0:
             return []
         
         # Implement reranking logic here
-        final_results = self._rerank_results(vector_results, bm25_results)
+        final_results = self._rerank_results(vector_results, bm25_results, limit=final_size)
         return final_results[:final_size]
     
-    def _rerank_results(self, vector_results: List[Dict], bm25_results: List[Dict], alpha: float = 0.7):
-        """Implement result reranking"""
+    def _rerank_results(self, vector_results: List[Dict], bm25_results: List[Dict], alpha: float = 0.7,
+                        limit: Optional[int] = None):
+        """Implement result reranking
+        
+        Scores live in parallel arrays (one row per document); only the top
+        `limit` hits (all when None) are copied into result dicts.
+        """
         if len(vector_results) == 0:
             return bm25_results
         if len(bm25_results) == 0:
             return vector_results
             
-        # Create mapping of document ID to BM25 score and rank
-        bm25_scores = {}
-        bm25_ranks = {}
-        max_bm25_score = max((hit['_score'] for hit in bm25_results), default=1)
-        
-        for rank, hit in enumerate(bm25_results):
-            bm25_scores[hit['_id']] = hit['_score']
-            bm25_ranks[hit['_id']] = rank + 1
-        
-        # Normalize and combine scores
-        max_vector_score = max((hit['_score'] for hit in vector_results), default=1)
-        
-        # Collect all unique documents
-        all_docs = {}
-        
-        # Add vector results
-        for rank, hit in enumerate(vector_results):
-            doc_id = hit['_id']
-            all_docs[doc_id] = {
-                'hit': hit,
-                'vector_score': hit['_score'],
-                'vector_rank': rank + 1,
-                'bm25_score': bm25_scores.get(doc_id, 0),
-                'bm25_rank': bm25_ranks.get(doc_id, len(bm25_results) + 1)
-            }
+        n_vector = len(vector_results)
+        n_bm25 = len(bm25_results)
+        vector_scores = np.fromiter((hit['_score'] for hit in vector_results), dtype=np.float64, count=n_vector)
+        bm25_scores = np.fromiter((hit['_score'] for hit in bm25_results), dtype=np.float64, count=n_bm25)
+        
+        # Position of each vector hit in the BM25 list (-1 when absent), and the BM25-only hits
+        bm25_index = {hit['_id']: i for i, hit in enumerate(bm25_results)}
+        vector_ids = {hit['_id'] for hit in vector_results}
+        bm25_of_vector = np.fromiter(
+            (bm25_index.get(hit['_id'], -1) for hit in vector_results), dtype=np.intp, count=n_vector
+        )
+        in_bm25 = bm25_of_vector >= 0
+        bm25_only = np.array(
+            [i for i, hit in enumerate(bm25_results) if hit['_id'] not in vector_ids], dtype=np.intp
+        )
         
-        # Add BM25-only results
-        for rank, hit in enumerate(bm25_results):
-            doc_id = hit['_id']
-            if doc_id not in all_docs:
-                all_docs[doc_id] = {
-                    'hit': hit,
-                    'vector_score': 0,
-                    'vector_rank': len(vector_results) + 1,
-                    'bm25_score': hit['_score'],
-                    'bm25_rank': rank + 1
-                }
+        # One row per unique document: vector hits in order, then BM25-only hits.
+        # Missing scores are 0 and missing ranks are one past the end of that list.
+        doc_vector_score = np.concatenate([vector_scores, np.zeros(len(bm25_only))])
+        doc_vector_rank = np.concatenate([np.arange(1, n_vector + 1), np.full(len(bm25_only), n_vector + 1)])
+        doc_bm25_score = np.concatenate([np.where(in_bm25, bm25_scores[bm25_of_vector], 0.0), bm25_scores[bm25_only]])
+        doc_bm25_rank = np.concatenate([np.where(in_bm25, bm25_of_vector + 1, n_bm25 + 1), bm25_only + 1])
         
         # Calculate combined scores using RRF + normalized score fusion
-        reranked_results = []
         k = 60  # RRF parameter
+        max_vector_score = vector_scores.max()
+        max_bm25_score = bm25_scores.max()
+        norm_vector_score = doc_vector_score / max_vector_score if max_vector_score > 0 else np.zeros_like(doc_vector_score)
+        norm_bm25_score = doc_bm25_score / max_bm25_score if max_bm25_score > 0 else np.zeros_like(doc_bm25_score)
         
-        for doc_id, data in all_docs.items():
-            # Normalized scores
-            norm_vector_score = data['vector_score'] / max_vector_score if max_vector_score > 0 else 0
-            norm_bm25_score = data['bm25_score'] / max_bm25_score if max_bm25_score > 0 else 0
-            
-            # RRF scores
-            rrf_vector = 1 / (k + data['vector_rank'])
-            rrf_bm25 = 1 / (k + data['bm25_rank'])
-            
-            # Combined score (weighted combination of normalized scores and RRF)
-            score_fusion = alpha * norm_vector_score + (1 - alpha) * norm_bm25_score
-            rrf_fusion = alpha * rrf_vector + (1 - alpha) * rrf_bm25
-            
-            # Final combined score
-            combined_score = 0.7 * score_fusion + 0.3 * rrf_fusion
-            
-            new_hit = data['hit'].copy()
-            new_hit['_score'] = combined_score
-            new_hit['_vector_score'] = data['vector_score']
-            new_hit['_bm25_score'] = data['bm25_score']
-            
-            reranked_results.append(new_hit)
+        score_fusion = alpha * norm_vector_score + (1 - alpha) * norm_bm25_score
+        rrf_fusion = alpha * (1 / (k + doc_vector_rank)) + (1 - alpha) * (1 / (k + doc_bm25_rank))
+        combined_scores = 0.7 * score_fusion + 0.3 * rrf_fusion
+        
+        # Stable sort keeps the previous tie order (vector hits first)
+        order = np.argsort(-combined_scores, kind='stable')
         
-        reranked_results.sort(key=lambda x: x['_score'], reverse=True)
-        return reranked_results 
\ No newline at end of file
+        doc_hits = vector_results + [bm25_results[i] for i in bm25_only]
+        # Gather the survivors' scores first, then build each output hit in one dict display
+        top = order[:limit]
+        return [
+            {**doc_hits[i], '_score': score, '_vector_score': vector_score, '_bm25_score': bm25_score}
+            for i, score, vector_score, bm25_score in zip(
+                top.tolist(),
+                combined_scores[top].tolist(),
+                doc_vector_score[top].tolist(),
+                doc_bm25_score[top].tolist()
+            )
+        ] 
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+from pathlib import Path
 
 # A dictionary to hold the file paths and their content
 # Using triple single quotes ''' to avoid conflicts with docstrings """
@@ -89,8 +90,9 @@ CREATE TABLE IF NOT EXISTS user_sessions (
 -- Create indexes
 CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
-CREATE INDEX IF NOT EXISTS idx_sessions_token ON user_sessions(session_token);
-CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON user_sessions(user_id);
+-- session_token lookups use the index behind its UNIQUE constraint
+-- (user_id, expires_at) also serves user_id-only lookups and FK cascades
+CREATE INDEX IF NOT EXISTS idx_sessions_user_expires ON user_sessions(user_id, expires_at);
 
 -- Insert a default admin user (password: admin123)
 INSERT INTO users (username, email, hashed_password, is_superuser) 
@@ -752,20 +754,17 @@ def create_project_structure():
     """
     print("🚀 Starting project setup...")
 
-    for file_path, content in project_files.items():
-        # Get the directory name from the file path
-        directory = os.path.dirname(file_path)
-
-        # Create the directory if it doesn't exist
-        if directory and not os.path.exists(directory):
-            print(f"Creating directory: {directory}/")
-            os.makedirs(directory)
+    # Create each directory once, up front
+    directories = sorted({os.path.dirname(file_path) for file_path in project_files} - {""})
+    for directory in directories:
+        print(f"Creating directory: {directory}/")
+        os.makedirs(directory, exist_ok=True)
 
+    for file_path, content in project_files.items():
         # Write the file
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                # .strip() removes leading/trailing whitespace from the multiline string
-                f.write(content.strip())
+            # .strip() removes leading/trailing whitespace from the multiline string
+            Path(file_path).write_bytes(content.strip().encode('utf-8'))
             print(f"✅ Created file: {file_path}")
         except IOError as e:
             print(f"❌ Error creating file {file_path}: {e}")
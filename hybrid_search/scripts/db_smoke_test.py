@@ -60,33 +60,30 @@ def main():
         db.commit()
         print(f"Created chat_session id={chat_session_id}")
 
-        # Add messages via SQL
+        # Add messages via SQL: one executemany, which the engine's
+        # executemany_mode="values_plus_batch" sends as a single execute_values
         import json
         db.execute(text(
             """
             INSERT INTO chat_messages (chat_session_id, user_id, role, content, message_metadata)
             VALUES (:sid, :uid, :role, :content, :meta)
             """
-        ), {
-            "sid": chat_session_id,
-            "uid": user.id,
-            "role": "user",
-            "content": "Hello, database!",
-            "meta": json.dumps({"test": True}),
-        })
-
-        db.execute(text(
-            """
-            INSERT INTO chat_messages (chat_session_id, user_id, role, content, message_metadata)
-            VALUES (:sid, :uid, :role, :content, :meta)
-            """
-        ), {
-            "sid": chat_session_id,
-            "uid": user.id,
-            "role": "assistant",
-            "content": "Acknowledged. DB is reachable.",
-            "meta": json.dumps({"reply": True}),
-        })
+        ), [
+            {
+                "sid": chat_session_id,
+                "uid": user.id,
+                "role": "user",
+                "content": "Hello, database!",
+                "meta": json.dumps({"test": True}),
+            },
+            {
+                "sid": chat_session_id,
+                "uid": user.id,
+                "role": "assistant",
+                "content": "Acknowledged. DB is reachable.",
+                "meta": json.dumps({"reply": True}),
+            },
+        ])
         db.commit()
 
         # Validate counts
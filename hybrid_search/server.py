@@ -5,14 +5,16 @@ FastAPI server for Hybrid Search System with Authentication
 
 import os
 import sys
+import asyncio
 import uvicorn
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, Query, Depends, status
+from fastapi import FastAPI, HTTPException, Query, Depends, status, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
@@ -27,21 +29,21 @@ from auth.models import UserCreate, UserLogin, UserResponse, Token, User
 from chat.service import ChatService
 
 # Import your existing workflow - delay import to avoid circular imports
-SearchConfig = None
+get_config = None
 HybridSearchWorkflow = None
 
 def import_workflow_modules():
     """Import workflow modules to avoid circular imports"""
-    global SearchConfig, HybridSearchWorkflow
+    global get_config, HybridSearchWorkflow
     try:
-        from config.settings import SearchConfig
+        from config.settings import get_config
         from workflows.langgraph_workflow import HybridSearchWorkflow
         print("✅ Successfully imported hybrid search modules")
         return True
     except ImportError as e:
         print(f"❌ Import error: {e}")
         print("Please check your project structure and adjust imports")
-        SearchConfig = None
+        get_config = None
         HybridSearchWorkflow = None
         return False
 
@@ -105,6 +107,10 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-key-change-this-in-produ
 auth_service = AuthService(redis_client, SECRET_KEY)
 chat_service = ChatService()
 
+# Password hashing/verification is CPU-bound and runs in worker threads; cap how many
+# run at once so a burst of logins queues here instead of taking every pool thread
+_password_hash_slots = asyncio.Semaphore(os.cpu_count() or 1)
+
 # Global workflow instance
 workflow_instance = None
 
@@ -139,12 +145,8 @@ async def lifespan(app: FastAPI):
         print("⚠️ Workflow modules not available - running in mock mode")
     else:
         try:
-            config = SearchConfig(
-                max_context_tokens=8000,
-                max_output_tokens=1024,
-                default_search_method="multi_stage",
-                default_num_results=5,
-            )
+            config = get_config()
+            config.display_config()
             
             workflow_instance = HybridSearchWorkflow(config)
             print("✅ Hybrid Search Workflow initialized successfully")
@@ -269,33 +271,44 @@ async def health_check():
 async def register(user: UserCreate, db: Session = Depends(get_db)):
     """Register a new user"""
     # Check if user already exists
-    if auth_service.get_user_by_username(db, user.username):
+    if await run_in_threadpool(auth_service.get_user_by_username, db, user.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
     
     try:
-        db_user = auth_service.create_user(db, user)
-        return UserResponse(
-            id=db_user.id,
-            username=db_user.username,
-            email=db_user.email,
-            is_active=db_user.is_active,
-            is_superuser=db_user.is_superuser,
-            created_at=db_user.created_at
-        )
+        # create_user hashes the password; keep the KDF off the event loop
+        async with _password_hash_slots:
+            db_user = await run_in_threadpool(auth_service.create_user, db, user)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Registration failed: {str(e)}"
         )
 
+    if db_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered"
+        )
+
+    return UserResponse(
+        id=db_user.id,
+        username=db_user.username,
+        email=db_user.email,
+        is_active=db_user.is_active,
+        is_superuser=db_user.is_superuser,
+        created_at=db_user.created_at
+    )
+
 @app.post("/auth/login", response_model=Token, tags=["Authentication"])
-async def login(login_data: UserLogin, db: Session = Depends(get_db)):
+async def login(login_data: UserLogin, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """Login user and return access token"""
     try:
-        result = auth_service.login_user(db, login_data)
+        # login_user verifies the password hash; keep the KDF off the event loop
+        async with _password_hash_slots:
+            result = await run_in_threadpool(auth_service.login_user, db, login_data, background_tasks)
         return Token(
             access_token=result["access_token"],
             token_type=result["token_type"],
@@ -394,7 +407,10 @@ async def search_post(
         )
     
     try:
-        result = workflow_instance.run(
+        # The workflow embeds the query and calls OpenSearch/Gemini synchronously;
+        # run it in a worker thread so the event loop keeps serving other requests
+        result = await run_in_threadpool(
+            workflow_instance.run,
             query=request.query,
             index_name=request.index_name,
             search_method=request.search_method,
@@ -1,7 +1,8 @@
 """Utility components for the hybrid search system."""
 
-from .state import SearchState
+from .state import SearchState, SearchResults
 from .token_counter import TokenCounter
 from .serialization import convert_numpy_values
+from .gemini import get_genai
 
-__all__ = ["SearchState", "TokenCounter", "convert_numpy_values"] 
\ No newline at end of file
+__all__ = ["SearchState", "SearchResults", "TokenCounter", "convert_numpy_values", "get_genai"] 
\ No newline at end of file
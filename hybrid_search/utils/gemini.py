@@ -0,0 +1,8 @@
+"""Lazy access to the Gemini SDK"""
+from functools import lru_cache
+
+@lru_cache(maxsize=1)
+def get_genai():
+    """Import google.generativeai on first use; its protobuf/gRPC stubs are slow to load"""
+    import google.generativeai as genai
+    return genai
@@ -1,4 +1,21 @@
-from typing import List, Dict, Any, Optional, TypedDict
+from dataclasses import dataclass
+from typing import List, Dict, Any, FrozenSet, Optional, TypedDict
+
+@dataclass(frozen=True, slots=True)
+class SearchResults:
+    """Column view of search hits, built once by the retriever for downstream nodes"""
+    ids: List[str]
+    passage_texts: List[str]
+    scores: List[float]
+
+    @classmethod
+    def from_hits(cls, hits: List[Dict[str, Any]]) -> "SearchResults":
+        ids, passage_texts, scores = [], [], []
+        for hit in hits:
+            ids.append(hit['_id'])
+            passage_texts.append(hit['_source']['passage_text'])
+            scores.append(hit['_score'])
+        return cls(ids, passage_texts, scores)
 
 class SearchState(TypedDict):
     """Shared state across all workflow nodes"""
@@ -7,9 +24,11 @@ class SearchState(TypedDict):
     index_name: str
     search_method: str
     num_results: int
+    query_word_set: Optional[FrozenSet[str]]  # lowercased query words, set by the coordinator
     
     # Search results and processing
     search_results: List[Dict[str, Any]]
+    result_columns: Optional[SearchResults]
     processed_context: str
     context_metadata: Dict[str, Any]
     
@@ -1,5 +1,11 @@
+import hashlib
+import threading
 import tiktoken
-from typing import Optional
+from collections import OrderedDict
+from typing import List, Optional
+
+# Max number of passage token counts kept per TokenCounter
+TOKEN_COUNT_CACHE_SIZE = 50_000
 
 class TokenCounter:
     """Utility for counting tokens in text"""
@@ -9,14 +15,62 @@ class TokenCounter:
             self.tokenizer = tiktoken.get_encoding(encoding_name)
         except:
             self.tokenizer = None
+        
+        # LRU of counts keyed on a 128-bit digest of the text, so cached passages
+        # are not kept alive and distinct passages cannot share an entry
+        self._count_cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._count_cache_lock = threading.Lock()
+    
+    @staticmethod
+    def _cache_key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode(), digest_size=16).digest()
     
     def count_tokens(self, text: str) -> int:
         """Count tokens in text"""
-        if self.tokenizer:
-            return len(self.tokenizer.encode(text))
-        else:
+        if not self.tokenizer:
             # Fallback estimation
             return len(text) // 4
+        
+        key = self._cache_key(text)
+        with self._count_cache_lock:
+            count = self._count_cache.get(key)
+            if count is not None:
+                self._count_cache.move_to_end(key)
+                return count
+        
+        count = len(self.tokenizer.encode_ordinary(text))
+        self._store_counts({key: count})
+        return count
+    
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Count tokens for many texts, encoding only the cache misses in one batch call"""
+        if not self.tokenizer:
+            return [len(text) // 4 for text in texts]
+        
+        keys = [self._cache_key(text) for text in texts]
+        counts: List[Optional[int]] = [None] * len(texts)
+        with self._count_cache_lock:
+            for i, key in enumerate(keys):
+                count = self._count_cache.get(key)
+                if count is not None:
+                    self._count_cache.move_to_end(key)
+                    counts[i] = count
+        
+        misses = [i for i, count in enumerate(counts) if count is None]
+        if misses:
+            encoded = self.tokenizer.encode_ordinary_batch([texts[i] for i in misses])
+            for i, tokens in zip(misses, encoded):
+                counts[i] = len(tokens)
+            self._store_counts({keys[i]: counts[i] for i in misses})
+        return counts
+    
+    def _store_counts(self, entries: dict):
+        with self._count_cache_lock:
+            for key, count in entries.items():
+                self._count_cache[key] = count
+                self._count_cache.move_to_end(key)
+            while len(self._count_cache) > TOKEN_COUNT_CACHE_SIZE:
+                self._count_cache.popitem(last=False)
     
     def truncate_to_tokens(self, text: str, max_tokens: int) -> str:
         """Truncate text to fit within token limit"""
@@ -217,6 +217,8 @@ class HybridSearchWorkflow:
             "total_tokens": 0,
             "cost_estimate": 0.0,
             "search_results": [],
+            "result_columns": None,
+            "query_word_set": None,
             "processed_context": "",
             "context_metadata": {},
             "content_analysis": {},
@@ -250,6 +252,8 @@ class HybridSearchWorkflow:
             "total_tokens": 0,
             "cost_estimate": 0.0,
             "search_results": [],
+            "result_columns": None,
+            "query_word_set": None,
             "processed_context": "",
             "context_metadata": {},
             "content_analysis": {},
@@ -292,6 +296,7 @@ class HybridSearchWorkflow:
             # For critical nodes, add fallback behavior
             if node_name == "retriever":
                 state["search_results"] = []
+                state["result_columns"] = None
                 state["messages"].append("Using empty search results as fallback")
             elif node_name == "answer_synthesizer":
                 state["answer_data"] = {